@@ -0,0 +1,219 @@
+import re
+
+import pytest
+
+from bench_startup import load_plugin
+from conftest import apex_source, js_source
+from fake_sublime import Region, View
+from mavensmate_util import apex, changed, cli, compact, doc_comment, figlet, outline, stamps, titles
+from mavensmate_util.views import ApexHeaderIndex, BatchEdit
+
+def test_header_scan(benchmark, size):
+    view = View(apex_source(size), "AccountService.cls")
+
+    def scan():
+        ApexHeaderIndex.invalidate(view)
+        return ApexHeaderIndex.get(view)
+
+    index = benchmark(scan)
+    assert index.class_name == "AccountService"
+    assert index.version == "@Version-1.0.1"
+
+def test_console_version_bump_on_save(benchmark, size):
+    text = js_source(size)
+
+    def bump():
+        return apex.apply_edits(text, apex.console_version_edits(apex.find_console_versions(text)))
+
+    result = benchmark(bump)
+    assert "console.log('Version: 1');" in result
+
+@pytest.mark.parametrize("path", ["handler.js", "AccountService.cls"])
+def test_stamp_scan_on_save(benchmark, size, path):
+    # Every rule of every file type in one pass, as on_pre_save runs them.
+    text = js_source(size) if path.endswith(".js") else apex_source(size)
+    scanner = stamps.Scanner([(name, rule) for name, rule in sorted(stamps.RULES.items())])
+
+    def scan():
+        return scanner.edits(scanner.scan(text))
+
+    edits = benchmark(scan)
+    assert edits
+
+@pytest.mark.parametrize("path", ["bundle.resource", "AccountService.cls"])
+def test_increment_console_version(benchmark, path):
+    # The increment_console_version key bumps console markers in any file type; the
+    # save stamps of a file type without rules are no edits, not an error. 100 KB:
+    # the stand-in view copies the whole text on every replace.
+    plugin = load_plugin()
+    size = 100 * 1024
+    text = js_source(size) if path.endswith(".resource") else apex_source(size) + "// console.log('Version: 1');\n"
+    view = View(text, path)
+    versions = [version for begin, end, version in apex.find_console_versions(text)]
+    command = plugin.IncrementConsoleVersionCommand(view)
+    runs = []
+
+    def increment():
+        runs.append(1)
+        command.run(None)
+
+    benchmark.pedantic(increment, rounds=5)
+    assert versions and [version for begin, end, version in apex.find_console_versions(view.text)] == [version + len(runs) for version in versions]
+    if path.endswith(".resource"):
+        assert plugin.StampIndex.get_edits(view) == []
+    else:
+        # The header @Date is a save stamp, not this command's.
+        assert "2018-04-11" in view.text
+
+@pytest.mark.parametrize("title", ["Start Test", "Account Service Helpers 2018"])
+def test_figlet_render(benchmark, title):
+    def render():
+        figlet.render.cache_clear()
+        return figlet.render(title, titles.TITLE_WIDTH)
+
+    lines = benchmark(render)
+    assert lines[0] == "/*" and lines[-1] == "*/"
+
+def synthetic_font(height=8):
+    # A .flf with every required character plus 500 code-tagged ones.
+    lines = ["flf2a$ %d %d 20 0 1" % (height, height - 1), "synthetic"]
+    for code in figlet.REQUIRED_CODES + list(range(0x100, 0x100 + 500)):
+        if code >= 0x100:
+            lines.append("%d" % code)
+        lines.extend(["$%s%s@" % (chr(65 + row % 26), "#" * (code % 13)) for row in range(height - 1)] + ["$%s@@" % ("#" * (code % 13))])
+    return ("\n".join(lines) + "\n").encode("latin-1")
+
+@pytest.mark.parametrize("cached", [False, True], ids=["parse", "cached"])
+def test_figlet_font_load(benchmark, tmp_path, cached):
+    blob = synthetic_font()
+    cache_directory = str(tmp_path) if cached else None
+    figlet.compile_blob(blob, cache_directory)
+
+    font = benchmark(figlet.compile_blob, blob, cache_directory)
+    assert font.widths["A"] == 2 + 65 % 13
+
+@pytest.mark.parametrize("cursors", [1, 50, 500])
+def test_multi_cursor_title_wrap(benchmark, size, cursors):
+    source = apex_source(size)
+
+    def wrap():
+        view = View(source, "AccountService.cls")
+        view.sel().clear()
+        for region in view.find_all("// -+  Query  -+")[:cursors]:
+            view.sel().add(Region(region.begin() + 44, region.begin() + 49))
+        BatchEdit(view).run(None, lambda region, facts: titles.title_change(view, region, facts.tab_size))
+        return view
+
+    view = benchmark.pedantic(wrap, rounds=3)
+    assert "  Query  " in view.text
+
+def test_resize_section_titles(benchmark, size):
+    # The sweep ResizeSectionTitlesCommand makes: one find_all, then only ruler lines.
+    view = View(apex_source(size), "AccountService.cls")
+
+    def resize():
+        changes = []
+        for line in view.find_all(titles.RULER_PATTERN):
+            change = titles.ruler_change(view.substr(line), 4)
+            if change is not None:
+                changes.append(change)
+        return changes
+
+    changes = benchmark(resize)
+    assert changes and len(changes) == len(view.find_all(titles.RULER_PATTERN))
+
+@pytest.mark.parametrize("strings", [False, True])
+def test_document_all_methods(benchmark, size, strings):
+    # apex_source with every method comment removed, as in a legacy class; with
+    # strings, each body holds a literal that would open and close comments.
+    text = re.sub(r"\t/\*\*\n(?:\t \*.*\n)*\t\*/\n", "", apex_source(size))
+    if strings:
+        text = text.replace("\t\treturn [SELECT", "\t\tString pattern = '*/ /*';\n\t\treturn [SELECT")
+    methods = text.count("public static List<Account>")
+
+    edits = benchmark(apex.method_comment_edits, text, "/**\n *  @Version-1.0.1\n*/")
+    assert len(edits) == methods
+
+def test_outline_edit(benchmark, size):
+    # One keystroke in the middle of the class, then the facts commands read.
+    text = apex_source(size)
+    middle = text.index("\n", len(text) // 2) + 1
+    edited = [text[:middle] + "\t// x\n" + text[middle:], text]
+    tree = outline.Outline(text)
+
+    def edit():
+        edited.reverse()
+        tree.update(edited[0])
+        return tree.class_name, tree.is_test
+
+    assert benchmark(edit) == ("AccountService", False)
+    assert tree.retokenized <= 2
+
+def test_compact_headers(benchmark, size):
+    # Every method comment carrying the inner class scaffold's empty placeholder tags.
+    placeholders = "\t *  \t@Added\n\t *  \t\t@AccountService\n\t *  \t\t\t@Variables\n\t *  \t\t\t\t@Private\n\t *  \t\t\t\t\t\n\t*/\n"
+    text = apex_source(size).replace("\t*/\n", placeholders)
+    methods = text.count("public static List<Account>")
+
+    edits = benchmark(compact.compact_edits, text)
+    assert len(edits) == methods and compact.saved(edits) == methods * (len(placeholders) - len("\t*/\n"))
+
+@pytest.mark.parametrize("indent", ["tabs", "spaces"])
+def test_compact_filled_headers(benchmark, size, indent):
+    # Tags with values under them, indented with tabs or with spaces: nothing to remove.
+    filled = "\t *  \t@Added\n\t *  \t\t@AccountService\n\t *  \t\t\t@Methods\n\t *  \t\t\t\t@Public\n\t *  \t\t\t\t\tgetAccounts\n\t*/\n"
+    text = apex_source(size).replace("\t*/\n", filled)
+    if indent == "spaces":
+        text = text.replace(" *  \t", " *  " + " " * 4).replace("\t\t", " " * 8).replace("\t@", " " * 4 + "@").replace("\tgetAccounts", " " * 4 + "getAccounts")
+
+    edits = benchmark(compact.compact_edits, text)
+    assert edits == [] and apex.apply_edits(text, edits) == text
+
+def test_changed_methods_on_save(benchmark, size):
+    # One method body edited since the last save: only that method is read and hashed.
+    text = apex_source(size)
+    middle = text.index("return [SELECT", len(text) // 2)
+    edited = text[:middle] + "x = 1;" + text[middle:]
+    current = [text]
+    tree = outline.Outline(text)
+    hashes = changed.MethodHashes(tree, lambda begin, end: current[0][begin:end])
+    reads = []
+
+    def read(begin, end):
+        reads.append(begin)
+        return current[0][begin:end]
+
+    def setup():
+        # Every round: back to the saved text as the baseline, then the same edit.
+        current[0] = text
+        tree.update(text)
+        hashes.changed(tree, read)
+        current[0] = edited
+        tree.update(edited)
+        tree.classes
+        del reads[:]
+
+    methods = benchmark.pedantic(lambda: hashes.changed(tree, read), setup=setup, rounds=50)
+    assert len(methods) == 1 and len(reads) == 1
+
+@pytest.mark.parametrize("entries", [10, 500])
+def test_doc_comment_parse(benchmark, entries):
+    header = "/**\n" + "".join(" *  @Version-1.0.%d\n *  \t@Date\n *  \t\t2018-04-10\n *  \t@Changed\n *  \t\t@AccountService\n *  \t\t\t@Methods\n *  \t\t\t\t\n" % i for i in range(entries)) + "*/"
+
+    comment = benchmark(doc_comment.DocComment, header)
+    assert comment.latest_version == "@Version-1.0.%d" % (entries - 1)
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"], ids=["lf", "crlf"])
+@pytest.mark.parametrize("cached", [False, True], ids=["audit", "cached"])
+def test_audit_tree(benchmark, tmp_path, cached, newline):
+    # 500 classes of 8 KB, audited in one process; cached reruns only hash the files.
+    # Each names a test class under @UnitTests that is not in the tree.
+    source = apex_source(8 * 1024).replace("*/\n", " *  @UnitTests\n *  \tAccountService_Test\n*/\n", 1)
+    for index in range(500):
+        (tmp_path / ("Service%d.cls" % index)).write_bytes(source.replace("AccountService", "Service%d" % index).replace("\n", newline).encode("utf-8"))
+    cache = str(tmp_path / "audit.json")
+    cli.audit_paths([str(tmp_path)], cache)
+
+    results, summary = benchmark(cli.audit_paths, [str(tmp_path)], cache, 1, not cached)
+    assert summary["classes"] == 500 and summary["cached"] == (500 if cached else 0)
+    assert all([found["check"] for found in result["problems"]] == ["unit_tests"] for result in results.values())
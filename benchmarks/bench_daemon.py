@@ -0,0 +1,40 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from bench_startup import ROOT
+from conftest import apex_source
+from mavensmate_util import daemon, figlet, template
+
+# One batched "bump these 50 buffers" request: answered by a fresh server, by a warm
+# one that has seen the same buffers before, and by a new interpreter per call.
+
+def batch():
+    files = [{ "path": "src/classes/Service%d.cls" % index, "text": apex_source(16 * 1024).replace("AccountService", "Service%d" % index) } for index in range(50)]
+    return json.dumps({ "jsonrpc": "2.0", "id": 1, "method": "bump", "params": { "files": files } })
+
+def new_server():
+    return daemon.Server([template.PACKAGE_TEMPLATES], [figlet.PACKAGE_FONTS], "Bench")
+
+@pytest.mark.parametrize("server", ["cold", "warm", "process"])
+def test_daemon_batch(benchmark, server):
+    benchmark.group = "bump 50 buffers"
+    message = batch()
+
+    if server == "process":
+        def call():
+            output = subprocess.run([sys.executable, "-m", "mavensmate_util", "serve"], input=message.encode("utf-8"), stdout=subprocess.PIPE, cwd=ROOT, check=True).stdout
+            return json.loads(output.decode("utf-8"))
+        response = benchmark.pedantic(call, rounds=5)
+    elif server == "cold":
+        response = benchmark(lambda: new_server().handle(message))
+    else:
+        warm = new_server()
+        warm.handle(message)
+        response = benchmark(lambda: warm.handle(message))
+
+    files = response["result"]["files"]
+    assert len(files) == 50
+    assert all(result["changes"][0]["to"] == "@Version-1.0.2" for result in files)
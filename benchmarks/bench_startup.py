@@ -0,0 +1,31 @@
+import importlib
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+import fake_sublime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_plugin():
+    # Imports comment_utilities the way Sublime does: as a module of the package folder.
+    fake_sublime.install()
+    for name in list(sys.modules):
+        if name == "MavensMateUtil" or name.startswith("MavensMateUtil."):
+            del sys.modules[name]
+    package = importlib.util.module_from_spec(importlib.machinery.ModuleSpec("MavensMateUtil", None, is_package=True))
+    package.__path__ = [ROOT]
+    sys.modules["MavensMateUtil"] = package
+    plugin = importlib.import_module("MavensMateUtil.comment_utilities")
+    plugin.plugin_loaded()
+    return plugin
+
+def test_plugin_load_within_budget():
+    plugin = load_plugin()
+    assert plugin.startup_time * 1000 < plugin.STARTUP_BUDGET_MS
+    # The figlet font is not loaded until a banner is rendered.
+    assert "MavensMateUtil.mavensmate_util.ansi_shadow" not in sys.modules
+
+def test_plugin_load(benchmark):
+    benchmark(load_plugin)
@@ -0,0 +1,64 @@
+import pytest
+
+from bench_startup import load_plugin
+from conftest import apex_source
+from fake_sublime import Region, View
+
+# Latency of one "," keystroke: a plain insert, the insert_snippet binding the
+# keymap used to have, and smart_comma, at 1, 10 and 100 cursors in a 100 KB class.
+# Then one keystroke with the status bar size meter on, from 100 KB to 10 MB.
+
+def typing_view(cursors):
+    view = View(apex_source(100 * 1024), "AccountService.cls")
+    view.sel().clear()
+    for region in view.find_all(r"Set<Id> ids")[:cursors]:
+        view.sel().add(Region(region.begin() + len("Set<Id>")))
+    return view
+
+@pytest.fixture(scope="module")
+def plugin():
+    return load_plugin()
+
+@pytest.mark.parametrize("cursors", [1, 10, 100])
+@pytest.mark.parametrize("binding", ["insert", "insert_snippet", "smart_comma"])
+def test_comma_keystroke(benchmark, plugin, binding, cursors):
+    benchmark.group = "comma keystroke, %d cursors" % cursors
+    view = typing_view(cursors)
+
+    if binding == "insert":
+        def keystroke():
+            for region in reversed(list(view.sel())):
+                view.insert(None, region.begin(), ",")
+    elif binding == "insert_snippet":
+        def keystroke():
+            view.run_command("insert_snippet", { "contents": ", " })
+    else:
+        command = plugin.SmartCommaCommand(view)
+        def keystroke():
+            command.run(None)
+
+    benchmark.pedantic(keystroke, rounds=200)
+    if binding == "smart_comma":
+        assert view.text.count("Set<Id>, ") == cursors
+        # Every caret just after the ", " it typed, none pushed along by an earlier cursor.
+        assert len(view.sel()) == cursors
+        assert all(view.substr(Region(region.begin() - 2, region.begin())) == ", " and view.substr(region.begin()) == "i" for region in view.sel())
+
+@pytest.mark.parametrize("size", [100 * 1024, 1024 * 1024, 10 * 1024 * 1024])
+@pytest.mark.parametrize("meter", [False, True])
+def test_size_meter_keystroke(benchmark, plugin, meter, size):
+    benchmark.group = "keystroke with size meter, %d KB" % (size // 1024)
+    view = View(apex_source(size), "AccountService.cls", { "apex_size_meter_counted": True })
+    view.sel().clear()
+    view.sel().add(Region(view.find(r"Set<Id> ids", 0).end()))
+    listener = plugin.SizeMeterListener()
+    if meter:
+        listener.on_activated_async(view)
+
+    def keystroke():
+        view.insert(None, view.sel()[0].begin(), "x")
+        listener.on_modified(view)
+
+    benchmark.pedantic(keystroke, rounds=200)
+    if meter:
+        assert view.status["mavensmate_util_size"].startswith(format(view.size(), ","))
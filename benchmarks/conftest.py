@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_sublime
+from mavensmate_util import views
+
+views.Region = fake_sublime.Region
+
+SIZES = [1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024]
+
+APEX_HEADER = "\n".join([
+    "/**",
+    " *  ==================",
+    " *     AccountService   ",
+    " *  ==================",
+    " *  @Version-1.0.0",
+    " *  \t@Date",
+    " *  \t\t2018-04-10",
+    " *  @Version-1.0.1",
+    " *  \t@Date",
+    " *  \t\t2018-04-11",
+    "*/",
+    "public with sharing class AccountService {",
+    ""
+])
+
+APEX_METHOD = "\n".join([
+    "\t/**",
+    "\t *  @Version-1.0.1",
+    "\t *  \t@Created",
+    "\t*/",
+    "\tpublic static List<Account> getAccounts%d(Set<Id> ids) {",
+    "\t\t// ---------------------------------------  Query  ---------------------------------------",
+    "\t\treturn [SELECT Id, Name FROM Account WHERE Id IN :ids];",
+    "\t}",
+    ""
+])
+
+JS_CHUNK = "\n".join([
+    "function handler%d(event) {",
+    "\tconsole.log('Version: %d');",
+    "\treturn event.target.value;",
+    "}",
+    ""
+])
+
+def apex_source(size):
+    parts = [APEX_HEADER]
+    length = len(APEX_HEADER)
+    i = 0
+    while length < size:
+        method = APEX_METHOD % i
+        parts.append(method)
+        length += len(method)
+        i += 1
+    parts.append("}\n")
+    return "".join(parts)
+
+def js_source(size):
+    parts = []
+    length = 0
+    i = 0
+    while length < size:
+        chunk = JS_CHUNK % (i, i)
+        parts.append(chunk)
+        length += len(chunk)
+        i += 1
+    return "".join(parts)
+
+@pytest.fixture(params=SIZES, ids=lambda size: "%dKB" % (size // 1024))
+def size(request):
+    return request.param
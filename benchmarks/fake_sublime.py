@@ -0,0 +1,219 @@
+import re
+
+# Just enough of the sublime API (Region, Settings, View with find, find_all,
+# substr, replace and sel) to drive the mavensmate_util helpers outside the editor.
+
+class Region(object):
+    def __init__(self, a, b=None):
+        self.a = a
+        self.b = a if b is None else b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return self.end() - self.begin()
+
+    def empty(self):
+        return self.a == self.b
+
+    def contains(self, x):
+        if isinstance(x, Region):
+            return self.begin() <= x.begin() and x.end() <= self.end()
+        return self.begin() <= x <= self.end()
+
+    def __eq__(self, other):
+        return isinstance(other, Region) and self.a == other.a and self.b == other.b
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.a, self.b))
+
+    def __repr__(self):
+        return "Region(%d, %d)" % (self.a, self.b)
+
+class Settings(object):
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+class Selection(object):
+    # Live, like Sublime's: iteration reads each region when it gets to it, and
+    # View.replace moves the regions after an edit.
+    def __init__(self):
+        self.regions = []
+
+    def __iter__(self):
+        index = 0
+        while index < len(self.regions):
+            yield self.regions[index]
+            index += 1
+
+    def __len__(self):
+        return len(self.regions)
+
+    def __getitem__(self, index):
+        return self.regions[index]
+
+    def clear(self):
+        self.regions = []
+
+    def add(self, region):
+        if not isinstance(region, Region):
+            region = Region(region)
+        self.regions.append(region)
+        self.regions.sort(key=lambda region: region.begin())
+
+    def add_all(self, regions):
+        self.regions.extend([region if isinstance(region, Region) else Region(region) for region in regions])
+        self.regions.sort(key=lambda region: region.begin())
+
+    def adjust(self, begin, end, length):
+        # end - begin characters at begin replaced by length characters: later points
+        # shift, points inside the replaced text move to the end of the new text.
+        def point(x):
+            if x >= end:
+                return x + length - (end - begin)
+            return x if x <= begin else begin + length
+        self.regions = [Region(point(region.a), point(region.b)) for region in self.regions]
+
+class View(object):
+    _next_id = 0
+
+    def __init__(self, text="", file_name=None, settings=None):
+        View._next_id += 1
+        self._id = View._next_id
+        self.text = text
+        self._file_name = file_name
+        self._change_count = 0
+        self._settings = Settings({"tab_size": 4, "tm_fullname": "Benchmark"})
+        self._settings.values.update(settings or {})
+        self._sel = Selection()
+        self._sel.add(Region(0))
+        self._patterns = {}
+        self.status = {}
+
+    def id(self):
+        return self._id
+
+    def file_name(self):
+        return self._file_name
+
+    def size(self):
+        return len(self.text)
+
+    def settings(self):
+        return self._settings
+
+    def window(self):
+        return None
+
+    def set_status(self, key, value):
+        self.status[key] = value
+
+    def erase_status(self, key):
+        self.status.pop(key, None)
+
+    def change_count(self):
+        return self._change_count
+
+    def sel(self):
+        return self._sel
+
+    def _compile(self, pattern, flags=0):
+        # Sublime patterns are multi-line; 1 is sublime.LITERAL.
+        key = (pattern, flags)
+        if key not in self._patterns:
+            self._patterns[key] = re.compile(re.escape(pattern) if flags & 1 else pattern, re.MULTILINE)
+        return self._patterns[key]
+
+    def find(self, pattern, start_point, flags=0):
+        match = self._compile(pattern, flags).search(self.text, start_point)
+        return Region(match.start(), match.end()) if match else Region(-1, -1)
+
+    def find_all(self, pattern, flags=0):
+        return [Region(match.start(), match.end()) for match in self._compile(pattern, flags).finditer(self.text)]
+
+    def substr(self, x):
+        if isinstance(x, Region):
+            if x.a < 0:
+                return ""
+            return self.text[x.begin():x.end()]
+        return self.text[x:x + 1]
+
+    def line(self, x):
+        begin = x.begin() if isinstance(x, Region) else x
+        end = x.end() if isinstance(x, Region) else x
+        line_end = self.text.find("\n", end)
+        return Region(self.text.rfind("\n", 0, begin) + 1, len(self.text) if line_end < 0 else line_end)
+
+    def full_line(self, x):
+        line = self.line(x)
+        return Region(line.a, min(line.b + 1, len(self.text)))
+
+    def match_selector(self, point, selector):
+        # No syntax here: nothing is a string or comment.
+        return False
+
+    def rowcol(self, point):
+        return (self.text.count("\n", 0, point), point - self.text.rfind("\n", 0, point) - 1)
+
+    def replace(self, edit, region, text):
+        self.text = self.text[:region.begin()] + text + self.text[region.end():]
+        self._change_count += 1
+        self._sel.adjust(region.begin(), region.end(), len(text))
+
+    def insert(self, edit, point, text):
+        self.replace(edit, Region(point), text)
+        return len(text)
+
+    def erase(self, edit, region):
+        self.replace(edit, region, "")
+
+    def run_command(self, name, args=None):
+        if name == "insert_snippet":
+            for region in reversed(list(self._sel)):
+                self.replace(None, region, args["contents"])
+
+def install():
+    # Registers this module and a matching sublime_plugin so the plugin itself can be imported.
+    import sys
+    import tempfile
+    import types
+
+    module = sys.modules[__name__]
+    directory = tempfile.mkdtemp(prefix="fake-sublime-")
+    module.packages_path = lambda: directory
+    module.cache_path = lambda: directory
+    module.windows = lambda: []
+    module.active_window = lambda: None
+    module.status_message = lambda message: None
+    module.set_timeout = lambda callback, delay=0: callback()
+    module.set_timeout_async = lambda callback, delay=0: callback()
+    module.load_settings = lambda name: _preferences
+    def load_resource(name):
+        raise IOError(name)
+    module.load_resource = load_resource
+    module.load_binary_resource = load_resource
+
+    plugin = types.ModuleType("sublime_plugin")
+    for name, attribute in (("TextCommand", "view"), ("ViewEventListener", "view"), ("WindowCommand", "window"), ("ApplicationCommand", None), ("EventListener", None)):
+        setattr(plugin, name, type(name, (object,), { "__init__": lambda self, target=None, attribute=attribute: attribute and setattr(self, attribute, target) }))
+    sys.modules["sublime"] = module
+    sys.modules["sublime_plugin"] = plugin
+
+class _Preferences(Settings):
+    def add_on_change(self, key, callback):
+        pass
+
+_preferences = _Preferences()
@@ -1,348 +1,34 @@
 import sublime
 import sublime_plugin
-import datetime, getpass
+import time
+
+_load_started = time.perf_counter()
+
+import datetime
+import hashlib
+import os
 import re
+import threading
+
+from .mavensmate_util import apex, bump, changed, compact, figlet, perf, stamps, template, titles, views
+from .mavensmate_util.project_index import ProjectIndex
+from .mavensmate_util.views import ApexHeaderIndex, BatchEdit, ViewFacts, today
 
 # Sublime Text API Reference: https://www.sublimetext.com/docs/3/api_reference.html
 
-_figlet_letters = {
-    "A" : [
-        " █████╗ ",
-        "██╔══██╗",
-        "███████║",
-        "██╔══██║",
-        "██║  ██║",
-        "╚═╝  ╚═╝"
-    ],
-    "B" : [
-        "██████╗ ",
-        "██╔══██╗",
-        "██████╔╝",
-        "██╔══██╗",
-        "██████╔╝",
-        "╚═════╝ "
-    ],
-    "C" : [
-        " █████╗",
-        "██╔═══╝",
-        "██║    ",
-        "██║    ",
-        "╚█████╗",
-        " ╚════╝"
-    ],
-    "D" : [
-        "█████╗ ",
-        "██╔═██╗",
-        "██║ ██║",
-        "██║ ██║",
-        "█████╔╝",
-        "╚════╝ "
-    ],
-    "E" : [
-        "██████╗",
-        "██╔═══╝",
-        "████╗  ",
-        "██╔═╝  ",
-        "██████╗",
-        "╚═════╝"
-    ],
-    "F" : [
-        "██████╗",
-        "██╔═══╝",
-        "████╗  ",
-        "██╔═╝  ",
-        "██║    ",
-        "╚═╝    "
-    ],
-    "G" : [
-        " █████╗ ",
-        "██╔═══╝ ",
-        "██║ ███╗",
-        "██║  ██║",
-        "╚█████╔╝",
-        " ╚════╝ "
-    ],
-    "H" : [
-        "██╗ ██╗",
-        "██║ ██║",
-        "██████║",
-        "██╔═██║",
-        "██║ ██║",
-        "╚═╝ ╚═╝"
-    ],
-    "I" : [
-        "██╗",
-        "██║",
-        "██║",
-        "██║",
-        "██║",
-        "╚═╝"
-    ],
-    "J" : [
-        "    ██╗",
-        "    ██║",
-        "    ██║",
-        "██  ██║",
-        "╚████╔╝",
-        " ╚═══╝ "
-    ],
-    "K" : [
-        "██╗  ██╗",
-        "██║ ██╔╝",
-        "█████╔╝ ",
-        "██╔═██╗ ",
-        "██║  ██╗",
-        "╚═╝  ╚═╝"
-    ],
-    "L" : [
-        "██╗    ",
-        "██║    ",
-        "██║    ",
-        "██║    ",
-        "██████╗",
-        "╚═════╝"
-    ],
-    "M" : [
-        "███╗   ███╗",
-        "████╗ ████║",
-        "██╔████╔██║",
-        "██║╚██╔╝██║",
-        "██║ ╚═╝ ██║",
-        "╚═╝     ╚═╝"
-    ],
-    "N" : [
-        "███╗   ██╗",
-        "████╗  ██║",
-        "██╔██╗ ██║",
-        "██║╚██╗██║",
-        "██║ ╚████║",
-        "╚═╝  ╚═══╝"
-    ],
-    "O" : [
-        " █████╗ ",
-        "██╔══██╗",
-        "██║  ██║",
-        "██║  ██║",
-        "╚█████╔╝",
-        " ╚════╝ "
-    ],
-    "P" : [
-        "██████╗ ",
-        "██╔══██╗",
-        "██████╔╝",
-        "██╔═══╝ ",
-        "██║     ",
-        "╚═╝     "
-    ],
-    "Q" : [
-        " █████╗  ",
-        "██╔═══██╗",
-        "██║   ██║",
-        "██║▄▄ ██║",
-        "╚██████╔╝",
-        " ╚══▀▀═╝ "
-    ],
-    "R" : [
-        "█████╗ ",
-        "██╔═██╗",
-        "█████╔╝",
-        "██╔═██╗",
-        "██║ ██║",
-        "╚═╝ ╚═╝"
-    ],
-    "S" : [
-        "██████╗",
-        "██╔═══╝",
-        "██████╗",
-        "╚═══██║",
-        "██████║",
-        "╚═════╝"
-    ],
-    "T" : [
-        "██████╗",
-        "╚═██╔═╝",
-        "  ██║  ",
-        "  ██║  ",
-        "  ██║  ",
-        "  ╚═╝  "
-    ],
-    "U" : [
-        "██╗  ██╗",
-        "██║  ██║",
-        "██║  ██║",
-        "██║  ██║",
-        "╚█████╔╝",
-        " ╚════╝ "
-    ],
-    "V" : [
-        "██╗  ██╗",
-        "██║  ██║",
-        "██║  ██║",
-        "╚██╗██╔╝",
-        " ╚███╔╝ ",
-        "  ╚══╝  "
-    ],
-    "W" : [
-        "██╗    ██╗",
-        "██║    ██║",
-        "██║ █╗ ██║",
-        "██║███╗██║",
-        "╚███╔███╔╝",
-        " ╚══╝╚══╝ "
-    ],
-    "X" : [
-        "██╗  ██╗",
-        "╚██╗██╔╝",
-        " ╚███╔╝ ",
-        " ██╔██╗ ",
-        "██╔╝ ██╗",
-        "╚═╝  ╚═╝"
-    ],
-    "Y" : [
-        "██╗   ██╗",
-        "╚██╗ ██╔╝",
-        " ╚████╔╝ ",
-        "  ╚██╔╝  ",
-        "   ██║   ",
-        "   ╚═╝   "
-    ],
-    "Z" : [
-        "██████╗",
-        "╚══██╔╝",
-        "  ██╔╝ ",
-        " ██╔╝  ",
-        "██████╗",
-        "╚═════╝"
-    ],
-    "0" : [
-        " █████╗ ",
-        "██╔═███╗",
-        "██║██╔█║",
-        "████╔╝█║",
-        "╚█████╔╝",
-        " ╚════╝ "
-    ],
-    "1" : [
-        " ██╗",
-        "███║",
-        "╚██║",
-        " ██║",
-        " ██║",
-        " ╚═╝"
-    ],
-    "2" : [
-        "█████╗ ",
-        "╚═══██╗",
-        " ████╔╝",
-        "██═══╝ ",
-        "██████╗",
-        "╚═════╝"
-    ],
-    "3" : [
-        "█████╗ ",
-        "╚═══██╗",
-        " ████╔╝",
-        " ╚══██╗",
-        "█████╔╝",
-        "╚════╝ "
-    ],
-    "4" : [
-        "██╗ ██╗",
-        "██║ ██║",
-        "██████║",
-        "╚═══██║",
-        "    ██║",
-        "    ╚═╝"
-    ],
-    "5" : [
-        "██████╗",
-        "██╔═══╝",
-        "██████╗",
-        "╚═══██║",
-        "██████║",
-        "╚═════╝"
-    ],
-    "6" : [
-        " █████╗ ",
-        "██╔═══╝ ",
-        "██████╗ ",
-        "██╔══██╗",
-        "╚█████╔╝",
-        " ╚════╝ "
-    ],
-    "7" : [
-        "██████╗",
-        "╚═══██║",
-        "   ██╔╝",
-        "  ██╔╝ ",
-        "  ██║  ",
-        "  ╚═╝  "
-    ],
-    "8" : [
-        " █████╗ ",
-        "██╔══██╗",
-        "╚█████╔╝",
-        "██╔══██╗",
-        "╚█████╔╝",
-        " ╚════╝ "
-    ],
-    "9" : [
-        " █████╗ ",
-        "██╔══██╗",
-        "╚██████║",
-        " ╚═══██║",
-        " █████╔╝",
-        " ╚════╝ "
-    ],
-    " " : [
-        "  ",
-        "  ",
-        "  ",
-        "  ",
-        "  ",
-        "  "
-    ],
-    "-" : [
-        "      ",
-        "      ",
-        "█████╗",
-        "╚════╝",
-        "      ",
-        "      "
-    ],
-    "/" : [
-        "    █╗",
-        "   █╔╝",
-        "  █╔╝ ",
-        " █╔╝  ",
-        "█╔╝   ",
-        "═╝    "
-    ],
-    "&" : [
-        "    █╗",
-        "   █╔╝",
-        "  █╔╝ ",
-        " █╔╝  ",
-        "█╔╝   ",
-        "═╝    "
-    ],
-    "_" : [
-        "       ",
-        "       ",
-        "       ",
-        "       ",
-        "██████╗",
-        "╚═════╝"
-    ], 
-    "." : [
-        "   ",
-        "   ",
-        "   ",
-        "   ",
-        "██╗",
-        "╚═╝"
-    ]  
-}
+views.Region = sublime.Region
+
+def run_batch(view, edit, render):
+    # BatchEdit.run, but a large file whose header or class declaration lies beyond
+    # large_file_scan_window gets a status message instead of a traceback.
+    try:
+        facts = BatchEdit(view).run(edit, render)
+    except IndexError:
+        if not ApexHeaderIndex.get(view).bounded:
+            raise
+        facts = None
+    if facts is None or (facts.loaded and facts.index.bounded and (facts.header_region.a < 0 or not facts.class_name)):
+        sublime.status_message("MavensMate Util: large file, only the first %d characters were searched for the header and class" % view.settings().get("large_file_scan_window", 262144))
 
 class FormatAsFiglet(sublime_plugin.TextCommand):
     # See https://github.com/patorjk/figlet-cli/blob/master/bin/figlet
@@ -350,45 +36,34 @@ class FormatAsFiglet(sublime_plugin.TextCommand):
     lines_to_insert = []
 
     @staticmethod
-    def get_lines(title):
-        upper = title.upper()
-        print('Formatting2 as Figlet ANSI Shadow: ' + upper);
-        i = 0
-        upper_length = len(upper)
-        lines = [
-            "/*"
-        ]
-        while (i < 6):
-            line = []
-            j = 0;
-            for letter in upper:
-                try:
-                    line.append(_figlet_letters[letter][i])
-                except Exception:
-                    pass
-            lines.append("".join(line))
-            i += 1
-        lines.append("*/")
-        return lines
-
-    @staticmethod
-    def format(title):
-        return "\n".join(FormatAsFiglet.get_lines(title))
+    def get_lines(title, wrap=False, font=None):
+        return list(figlet.render(title, titles.TITLE_WIDTH if wrap else None, Fonts.get(font)))
 
-    def run(self, edit):
+    @staticmethod
+    def format(title, wrap=False, font=None):
+        return "\n".join(figlet.render(title, titles.TITLE_WIDTH if wrap else None, Fonts.get(font)))
+
+    def run(self, edit, wrap=False, font=None):
         # Decorate each region.
         view = self.view
-        for region in view.sel():
+        font = font or view.settings().get("figlet_font")
+        try:
+            Fonts.get(font)
+        except (OSError, ValueError) as error:
+            sublime.status_message("MavensMate Util: %s" % error)
+            return
+        def render(region, facts):
             if not region.empty():
-                # Pad inside selected region.
-                title = view.substr(region)
-                view.replace(edit, region, "");
-                view.run_command("insert_snippet", { "contents": FormatAsFiglet.format(title)}) 
+                # Pad inside selected region. Plain text: glyphs from .flf fonts can hold
+                # $, \ or } that insert_snippet would expand, so the line's indent is added here.
+                indent = re.match(r"[ \t]*", view.substr(view.line(region.begin()))).group(0)
+                return (region, FormatAsFiglet.format(view.substr(region), wrap, font).replace("\n", "\n" + indent))
+        run_batch(view, edit, render)
 
 class AddDateCommand(sublime_plugin.TextCommand):
     @staticmethod
     def get_today():
-        return "%s" %  datetime.date.today().strftime("%Y-%m-%d")
+        return today()
 
     def run(self, edit):
         self.view.run_command("insert_snippet", { "contents": AddDateCommand.get_today() } )
@@ -397,19 +72,249 @@ class AddTimeCommand(sublime_plugin.TextCommand):
     def run(self, edit):
         self.view.run_command("insert_snippet", { "contents": "%s" %  datetime.datetime.now().strftime("%H:%M:%S %Z") } )
 
+class SmartCommaCommand(sublime_plugin.TextCommand):
+    # Types ", " at each cursor, or just "," inside strings and comments. When a space
+    # already follows, the comma goes in and the cursor steps over that space.
+    def run(self, edit, selector="string, comment"):
+        view = self.view
+        cursors = []
+        delta = 0
+        # A copy: the live selection moves with each replace, and delta already does that.
+        for region in list(view.sel()):
+            begin = region.begin() + delta
+            end = region.end() + delta
+            if view.match_selector(begin, selector):
+                text, step = ",", 0
+            elif view.substr(end) == " ":
+                text, step = ",", 1
+            else:
+                text, step = ", ", 0
+            view.replace(edit, sublime.Region(begin, end), text)
+            delta += len(text) - (end - begin)
+            cursors.append(sublime.Region(begin + len(text) + step))
+        selection = view.sel()
+        selection.clear()
+        selection.add_all(cursors)
+
 class FormatAsSectionTitleCommand(sublime_plugin.TextCommand):
     def run(self, edit):
         view = self.view
         self.view.run_command("npm_run_arbitrary")
 
+class Templates(object):
+    # Scaffold templates, looked up in Packages/User/<package>/templates before the
+    # package's own templates folder and recompiled when the file's mtime changes.
+    package = __name__.split(".")[0]
+    _resources = {}
+
+    @staticmethod
+    def directories():
+        return [
+            os.path.join(sublime.packages_path(), "User", Templates.package, "templates"),
+            template.PACKAGE_TEMPLATES
+        ]
+
+    @staticmethod
+    def get(name):
+        try:
+            return template.find(name, Templates.directories())
+        except OSError:
+            pass
+        # Packed .sublime-package: resources cannot change without a reload.
+        if name not in Templates._resources:
+            Templates._resources[name] = template.load(sublime.load_resource("Packages/%s/templates/%s%s" % (Templates.package, name, template.EXTENSION)))
+        return Templates._resources[name]
+
+    @staticmethod
+    def render(name, values, newline="\n"):
+        return Templates.get(name).render(values, newline)
+
+class Fonts(object):
+    # FIGlet fonts, looked up like Templates in Packages/User/<package>/fonts before the
+    # package's own fonts folder. Each .flf is compiled once into a table cached under
+    # the cache path by file hash.
+    _resources = {}
+
+    @staticmethod
+    def directories():
+        return [
+            os.path.join(sublime.packages_path(), "User", Templates.package, "fonts"),
+            figlet.PACKAGE_FONTS
+        ]
+
+    @staticmethod
+    def cache_directory():
+        return os.path.join(sublime.cache_path(), Templates.package, "fonts")
+
+    @staticmethod
+    def get(name):
+        # None for the built-in ANSI Shadow.
+        if not name or name == figlet.DEFAULT_FONT:
+            return None
+        try:
+            return figlet.find(name, Fonts.directories(), Fonts.cache_directory())
+        except OSError:
+            pass
+        # Packed .sublime-package.
+        if name not in Fonts._resources:
+            try:
+                blob = sublime.load_binary_resource("Packages/%s/fonts/%s%s" % (Templates.package, name, figlet.EXTENSION))
+            except IOError:
+                raise OSError("no FIGlet font named %s" % name)
+            Fonts._resources[name] = figlet.compile_blob(blob, Fonts.cache_directory())
+        return Fonts._resources[name]
+
+class ProjectIndexes(object):
+    # One ProjectIndex per window, built in a background thread when the project
+    # opens and persisted under the cache path so the next start only rescans changed files.
+    _windows = {}
+
+    @staticmethod
+    def cache_file(roots, kind="index"):
+        key = hashlib.sha1("\n".join(sorted(roots)).encode("utf-8")).hexdigest()
+        return os.path.join(sublime.cache_path(), Templates.package, "%s-%s.json" % (kind, key))
+
+    @staticmethod
+    def get(window):
+        if window is None or not window.folders():
+            return None
+        index = ProjectIndexes._windows.get(window.id())
+        if index is None or index.roots != sorted(window.folders()):
+            index = ProjectIndex(window.folders())
+            ProjectIndexes._windows[window.id()] = index
+            threading.Thread(target=ProjectIndexes.build, args=(index,), daemon=True).start()
+        return index
+
+    @staticmethod
+    def for_view(view):
+        return ProjectIndexes.get(view.window())
+
+    @staticmethod
+    def build(index):
+        cache_file = ProjectIndexes.cache_file(index.roots)
+        index.load(cache_file)
+        if index.update() or not os.path.exists(cache_file):
+            index.save(cache_file)
+
+    @staticmethod
+    def test_class_name(view, class_name):
+        index = ProjectIndexes.for_view(view)
+        tests = index.tests_for(class_name) if index is not None else []
+        return tests[0][1]["class_name"] if tests else class_name + "_test"
+
+    @staticmethod
+    def class_under_test(view, class_name):
+        index = ProjectIndexes.for_view(view)
+        classes = index.classes_under_test(class_name) if index is not None else []
+        if classes:
+            return classes[0][1]["class_name"]
+        if class_name.endswith('_Test'):
+            return class_name[:-5]
+        return class_name
+
+# Import plus plugin_loaded must stay under this; checked by benchmarks/bench_startup.py.
+STARTUP_BUDGET_MS = 50
+startup_time = None
+
+def plugin_loaded():
+    global startup_time
+    started = time.perf_counter()
+    preferences = sublime.load_settings("Preferences.sublime-settings")
+    def update_debug():
+        perf.debug = bool(preferences.get("mavensmate_util_debug", False))
+    preferences.add_on_change("mavensmate_util_debug", update_debug)
+    update_debug()
+
+    for window in sublime.windows():
+        ProjectIndexes.get(window)
+
+    startup_time = _load_time + time.perf_counter() - started
+    perf.record("plugin_loaded", startup_time)
+    if startup_time * 1000 > STARTUP_BUDGET_MS and perf.debug:
+        print("MavensMate Util: startup took %.1fms, over the %dms budget" % (startup_time * 1000, STARTUP_BUDGET_MS))
+
+class ProjectIndexListener(sublime_plugin.EventListener):
+    def on_activated_async(self, view):
+        ProjectIndexes.for_view(view)
+
+    def on_post_save_async(self, view):
+        index = ProjectIndexes.for_view(view)
+        if index is not None and view.file_name() is not None:
+            index.update_file(view.file_name())
+            index.save(ProjectIndexes.cache_file(index.roots))
+
+class ToggleApexTestCommand(sublime_plugin.TextCommand):
+    # Jump from a class to its test, or from a test to the class it covers.
+    def run(self, edit):
+        view = self.view
+        window = view.window()
+        index = ProjectIndexes.for_view(view)
+        if index is None:
+            sublime.status_message("Apex class index needs a project folder")
+            return
+        facts = ApexHeaderIndex.get(view)
+        if facts.is_test:
+            matches = index.classes_under_test(facts.class_name)
+        else:
+            matches = index.tests_for(facts.class_name)
+        matches = [match for match in matches if match[0] != view.file_name()]
+        if not matches:
+            sublime.status_message("No %s found for %s" % ("class under test" if facts.is_test else "test class", facts.class_name))
+        elif len(matches) == 1:
+            window.open_file(matches[0][0])
+        else:
+            window.show_quick_panel([[entry["class_name"], path] for path, entry in matches], lambda i: i >= 0 and window.open_file(matches[i][0]))
+
+def is_apex(view):
+    return view.file_name() is not None and view.file_name().endswith((".cls", ".trigger"))
+
+def run_in_background(view, name, analyze, report=None):
+    # analyze() runs on the async thread and returns [begin, end, text] edits. They are
+    # applied on the main thread in one edit, or dropped if the buffer changed meanwhile.
+    change_count = view.change_count()
+    def work():
+        if view.change_count() != change_count:
+            return
+        edits = perf.timed(name, size=lambda args: view.size())(analyze)()
+        def apply():
+            if view.change_count() != change_count:
+                sublime.status_message("MavensMate Util: the file changed while %s ran; nothing was applied" % name.split(".")[0])
+                return
+            if edits:
+                view.run_command("mavensmate_util_apply_edits", { "edits": edits })
+            if report is not None:
+                report(edits)
+        sublime.set_timeout(apply, 0)
+    sublime.set_timeout_async(work, 0)
+
+class ApexHeaderIndexListener(sublime_plugin.EventListener):
+    # Header, version, class name and outline are worked out off the UI thread
+    # when a class gets focus and shortly after each change, so commands find them ready.
+    def on_activated_async(self, view):
+        if is_apex(view):
+            ApexHeaderIndex.refresh(view, view.change_count())
+
+    def on_modified_async(self, view):
+        if is_apex(view):
+            change_count = view.change_count()
+            sublime.set_timeout_async(lambda: ApexHeaderIndex.refresh(view, change_count), 300)
+
+    def on_close(self, view):
+        ApexHeaderIndex.close(view)
+
 class AddCurrentVersionCommand(sublime_plugin.TextCommand):
     @staticmethod
     def get_header_region(view):
-        return view.find("^\\/\\*\\*([\\s\\S]*?)\\*\\/", 0)
+        return ApexHeaderIndex.get(view).header_region
 
     @staticmethod
     def get_current_version_from_header(view, header_region):
-        return re.findall("(@Version-[0-9\\.]+)", view.substr(header_region))[-1]
+        index = ApexHeaderIndex.get(view)
+        if header_region != index.header_region:
+            return apex.find_versions(view.substr(header_region))[-1]
+        if index.version is None:
+            raise IndexError("no @Version in header")
+        return index.version
 
     @staticmethod
     def get_current_version(view):
@@ -417,250 +322,389 @@ class AddCurrentVersionCommand(sublime_plugin.TextCommand):
 
     @staticmethod
     def get_class_name(view):
-
-        return view.substr(view.find(r" class (\w+)", 0, re.MULTILINE))[7:]
+        return ApexHeaderIndex.get(view).class_name
 
     @staticmethod
     def is_test(view):
-        return not view.find(r"@IsTest", 0, re.MULTILINE).empty()
+        return ApexHeaderIndex.get(view).is_test
 
     def run(self, edit):
-        header_region = self.view.find("^\\/\\*\\*([\\s\\S]*?)\\*\\/", 0)
         self.view.run_command("insert_snippet", { "contents": AddCurrentVersionCommand.get_current_version(self.view) })
 
+class StampIndex(object):
+    # On-save stamp rules (mavensmate_util.stamps) for a view and their matches,
+    # refreshed in the background so on_pre_save only has to apply the edits.
+    _views = {}
+
+    def __init__(self, view, change_count):
+        self.change_count = change_count
+        self.matches = StampIndex.scan(view)
+
+    @staticmethod
+    def rules(view):
+        settings = view.settings()
+        return stamps.rules_for(view.file_name(), settings.get("stamp_files"), settings.get("stamp_rules"))
+
+    @staticmethod
+    def scanner(view):
+        return stamps.scanner(StampIndex.rules(view))
+
+    @staticmethod
+    def profile(view, text):
+        # Per-rule timings, recorded as "stamps.<rule>" when mavensmate_util_debug is on.
+        if perf.debug:
+            for name, elapsed, matches in StampIndex.scanner(view).profile(text):
+                perf.record("stamps.%s" % name, elapsed, len(text), matches)
+
+    @staticmethod
+    @perf.timed("StampIndex.scan", size=lambda args: args[0].size())
+    def scan(view):
+        text = view.substr(sublime.Region(0, view.size()))
+        matches = StampIndex.scanner(view).scan(text)
+        perf.add_matches(len(matches))
+        StampIndex.profile(view, text)
+        return matches
+
+    @staticmethod
+    def is_tracked(view):
+        return bool(StampIndex.rules(view))
+
+    @staticmethod
+    def max_tracked_size(view):
+        settings = view.settings()
+        return settings.get("stamp_max_tracked_size", settings.get("console_version_max_tracked_size", 1048576))
+
+    @staticmethod
+    def refresh(view, change_count):
+        # Skip if the buffer moved on while this refresh was queued.
+        if view.change_count() != change_count or view.size() > StampIndex.max_tracked_size(view):
+            return
+        StampIndex._views[view.id()] = StampIndex(view, change_count)
+
+    @staticmethod
+    def get(view):
+        index = StampIndex._views.get(view.id())
+        if index is not None and index.change_count == view.change_count():
+            return index
+        return None
+
+    @staticmethod
+    def invalidate(view):
+        StampIndex._views.pop(view.id(), None)
+
+    @staticmethod
+    def scan_window(view):
+        settings = view.settings()
+        return min(view.size(), settings.get("stamp_scan_window", settings.get("console_version_scan_window", 65536)))
+
+    @staticmethod
+    @perf.timed("StampIndex.scan", size=lambda args: StampIndex.scan_window(args[0]))
+    def scan_bounded(view):
+        # Large buffers are not tracked per keystroke; only the leading window is scanned.
+        text = view.substr(sublime.Region(0, StampIndex.scan_window(view)))
+        matches = StampIndex.scanner(view).scan(text)
+        perf.add_matches(len(matches))
+        StampIndex.profile(view, text)
+        return matches
+
+    @staticmethod
+    def estimate_ms(view):
+        # Expected cost of the scan get_edits would run, from earlier scans; 0 when nothing needs scanning.
+        if StampIndex.get(view) is not None:
+            return 0
+        rate = perf.seconds_per_char("StampIndex.scan")
+        if rate is None:
+            return 0
+        if view.size() > StampIndex.max_tracked_size(view):
+            return rate * StampIndex.scan_window(view) * 1000
+        return rate * view.size() * 1000
+
+    @staticmethod
+    def get_edits(view):
+        index = StampIndex.get(view)
+        if index is not None:
+            matches = index.matches
+        elif view.size() > StampIndex.max_tracked_size(view):
+            matches = StampIndex.scan_bounded(view)
+        else:
+            matches = StampIndex(view, view.change_count()).matches
+        return StampIndex.scanner(view).edits(matches)
+
+class ChangedMethods(object):
+    # Method body hashes per Apex view (mavensmate_util.changed), taken when the file
+    # loads and on every save, which lists the methods changed in between under
+    # the latest @Version's @Changed section.
+    @staticmethod
+    def is_tracked(view):
+        return is_apex(view) and view.settings().get("track_changed_methods", True)
+
+    @staticmethod
+    def reader(view):
+        return lambda begin, end: view.substr(sublime.Region(begin, end))
+
+    @staticmethod
+    def track(view):
+        tree = ApexHeaderIndex.get(view).outline
+        if tree is not None:
+            changed.track(view.id(), tree, ChangedMethods.reader(view))
+
+    @staticmethod
+    @perf.timed("ChangedMethods.edits", size=lambda args: args[0].size())
+    def edits(view):
+        index = ApexHeaderIndex.get(view)
+        if index.outline is None:
+            # Over large_file_threshold: not tracked.
+            return []
+        methods = changed.since_save(view.id(), index.outline, ChangedMethods.reader(view))
+        perf.add_matches(len(methods))
+        return changed.changed_edits(index.doc_comment, index.class_name, [(changed.section(index.outline, method), changed.qualified_name(method)) for method in methods])
+
 class SaveListener(sublime_plugin.EventListener):
     def on_pre_save(self, view):
-        if view.file_name() is not None and view.file_name().endswith((".js", ".page")):
-            view.run_command("increment_console_version")
+        if view.settings().get("resize_section_titles_on_save", False):
+            view.run_command("resize_section_titles", { "wait": True })
+        if StampIndex.is_tracked(view):
+            SaveListener.stamp(view)
+        if ChangedMethods.is_tracked(view):
+            edits = ChangedMethods.edits(view)
+            if edits:
+                view.run_command("mavensmate_util_apply_edits", { "edits": edits })
 
-class IncrementConsoleVersionCommand(sublime_plugin.TextCommand):
+    @staticmethod
+    def stamp(view):
+        budget = view.settings().get("pre_save_latency_budget_ms", 100)
+        estimate = StampIndex.estimate_ms(view)
+        if budget and estimate > budget:
+            sublime.status_message("MavensMate Util: stamps skipped, estimated %dms exceeds pre_save_latency_budget_ms (%dms)" % (estimate, budget))
+            return
+        start = time.perf_counter()
+        try:
+            edits = StampIndex.get_edits(view)
+        except (KeyError, ValueError, re.error) as error:
+            sublime.status_message("MavensMate Util: stamp rules: %s" % error)
+            return
+        if edits:
+            view.run_command("apply_stamps", { "edits": edits })
+        elapsed = (time.perf_counter() - start) * 1000
+        if budget and elapsed > budget:
+            sublime.status_message("MavensMate Util: stamps took %dms, over pre_save_latency_budget_ms (%dms)" % (elapsed, budget))
+
+    def on_load_async(self, view):
+        if StampIndex.is_tracked(view):
+            StampIndex.refresh(view, view.change_count())
+        if ChangedMethods.is_tracked(view):
+            ChangedMethods.track(view)
+
+    def on_activated_async(self, view):
+        if StampIndex.is_tracked(view) and StampIndex.get(view) is None:
+            StampIndex.refresh(view, view.change_count())
+
+    def on_modified_async(self, view):
+        if StampIndex.is_tracked(view):
+            change_count = view.change_count()
+            sublime.set_timeout_async(lambda: StampIndex.refresh(view, change_count), 250)
+
+    def on_close(self, view):
+        StampIndex.invalidate(view)
+
+class SizeMeter(object):
+    # The class's character count in the status bar, toward the org's Apex limit.
+    # A keystroke only adds the change in view.size(); the count without comments
+    # is redone from the outline on the async thread once typing pauses.
+    _views = {}
+
+    def __init__(self, view):
+        self.size = view.size()
+        # Characters outside comments, 0 for test classes; None until counted.
+        self.counted = None
+        self.exact = False
+        self.is_test = False
+        self.project = None
+
+    @staticmethod
+    def is_shown(view):
+        return is_apex(view) and view.settings().get("apex_size_meter", True)
+
+    @staticmethod
+    def refresh(view, change_count):
+        meter = SizeMeter._views.get(view.id())
+        if meter is None or view.change_count() != change_count:
+            return
+        index = ApexHeaderIndex.get(view)
+        size = view.size()
+        if view.change_count() != change_count:
+            return
+        meter.size = size
+        meter.is_test = index.is_test
+        # Over large_file_threshold there is no outline: comments are counted too.
+        meter.exact = index.outline is not None
+        meter.counted = 0 if index.is_test else size - (index.outline.comment_length if meter.exact else 0)
+        project = ProjectIndexes.for_view(view)
+        if project is not None and project.files:
+            with project.lock:
+                entry = project.files.get(view.file_name())
+                meter.project = project.counted - (entry["counted"] if entry is not None else 0)
+        sublime.set_timeout(lambda: SizeMeter.show(view), 0)
+
+    @staticmethod
+    def modified(view):
+        meter = SizeMeter._views.get(view.id())
+        if meter is None:
+            return
+        size = view.size()
+        delta = size - meter.size
+        meter.size = size
+        selection = view.sel()
+        if meter.counted is not None and not meter.is_test and len(selection) and not view.match_selector(max(selection[0].begin() - 1, 0), "comment"):
+            meter.counted = max(meter.counted + delta, 0)
+        SizeMeter.show(view)
+
+    @staticmethod
+    def show(view):
+        meter = SizeMeter._views.get(view.id())
+        if meter is None:
+            return
+        settings = view.settings()
+        status = "%s chars" % format(meter.size, ",")
+        if meter.is_test:
+            status += ", test class"
+        elif meter.counted is not None and settings.get("apex_size_meter_counted", False):
+            status += ", %s%s counted" % ("" if meter.exact else "~", format(meter.counted, ","))
+        if meter.counted is not None and meter.project is not None:
+            limit = settings.get("apex_character_limit", 6000000)
+            total = meter.project + meter.counted
+            status += " | project %s of %s (%.1f%%)" % (format(total, ","), format(limit, ","), total * 100.0 / limit if limit else 0)
+        view.set_status("mavensmate_util_size", status)
+
+    @staticmethod
+    def close(view):
+        SizeMeter._views.pop(view.id(), None)
+
+class SizeMeterListener(sublime_plugin.EventListener):
+    def on_activated_async(self, view):
+        if not SizeMeter.is_shown(view):
+            if SizeMeter._views.pop(view.id(), None) is not None:
+                view.erase_status("mavensmate_util_size")
+            return
+        if view.id() not in SizeMeter._views:
+            SizeMeter._views[view.id()] = SizeMeter(view)
+        SizeMeter.refresh(view, view.change_count())
+
+    def on_modified(self, view):
+        # On the UI thread: constant time whatever the file size.
+        SizeMeter.modified(view)
+
+    def on_modified_async(self, view):
+        if view.id() in SizeMeter._views:
+            change_count = view.change_count()
+            sublime.set_timeout_async(lambda: SizeMeter.refresh(view, change_count), 350)
+
+    def on_post_save_async(self, view):
+        if view.id() in SizeMeter._views:
+            SizeMeter.refresh(view, view.change_count())
+
+    def on_close(self, view):
+        SizeMeter.close(view)
+
+class MavensmateUtilApplyEditsCommand(sublime_plugin.TextCommand):
+    def run(self, edit, edits=[]):
+        # Back to front so a longer value does not shift the regions still to come.
+        perf.add_matches(len(edits))
+        for begin, end, text in sorted(edits, reverse=True):
+            self.view.replace(edit, sublime.Region(begin, end), text)
+
+class ApplyStampsCommand(MavensmateUtilApplyEditsCommand):
+    def run(self, edit, edits=None):
+        if edits is None:
+            edits = StampIndex.get_edits(self.view)
+        MavensmateUtilApplyEditsCommand.run(self, edit, edits)
+
+class IncrementConsoleVersionCommand(MavensmateUtilApplyEditsCommand):
+    # Every console.log('Version: N'); in the file, whatever its type; the save
+    # stamp rules per extension are apply_stamps.
     def run(self, edit):
-        regions = self.view.find_all("console\\.log\\('Version: \\d+'\\);")
-        for region in regions:
-            version = self.view.substr(region)
-            self.view.replace(edit, region, re.sub(r"\d+", str(int(re.findall(r"\d+", version)[-1]) + 1), version))
+        view = self.view
+        markers = apex.find_console_versions(view.substr(sublime.Region(0, view.size())))
+        MavensmateUtilApplyEditsCommand.run(self, edit, apex.console_version_edits(markers))
 
 class AddExceptionClassCommand(sublime_plugin.TextCommand):
+    @staticmethod
+    def render(region, facts):
+        return (region, Templates.render("exception_class", facts.values()), True)
+
     def run(self, edit):
-        view = self.view
-        offset = view.substr(view.line(view.sel()[0]))
-        view.run_command("insert_snippet", { "contents": ("\n").join([
-            "public virtual with sharing class ${1:Test}$2Exception extends $2Exception {",
-                "\t/**",
-                "\t *  ===${1/./=/g}============",
-                "\t *     $1Exception",
-                "\t *  ===${1/./=/g}============",
-                "\t *  " + AddCurrentVersionCommand.get_current_version(view),
-                "\t *  \t@Creatd",
-                "\t *  \t@Added",
-                "\t *  \t\t@" + AddCurrentVersionCommand.get_class_name(view),
-                "\t *  \t\t\t@$1$2Exception",
-                "\t *  \t\t\t\t@Extends",
-                "\t *  \t\t\t\t\t@$2Exception",
-                "\t*/",
-                "}",
-                ""
-        ])})
+        run_batch(self.view, edit, AddExceptionClassCommand.render)
 
 class AddInnerClassCommand(sublime_plugin.TextCommand):
+    @staticmethod
+    def render(region, facts):
+        return (region, Templates.render("inner_class", facts.values()), True)
+
     def run(self, edit):
-        view = self.view
-        offset = view.substr(view.line(view.sel()[0]))
-        view.run_command("insert_snippet", { "contents": ("\n").join([
-            "public with sharing class ${1:InnerClass} {",
-                "\t/**",
-                "\t *  ===${1/./=/g}===",
-                "\t *     $1",
-                "\t *  ===${1/./=/g}===",
-                "\t *  " + AddCurrentVersionCommand.get_current_version(view),
-                "\t *  \t@Created",
-                "\t *  \t@Description",
-                "\t *  \t@Added",
-                "\t *  \t\t@" + AddCurrentVersionCommand.get_class_name(view),
-                "\t *  \t\t\t@$1",
-                "\t *  \t\t\t\t@Variables",
-                "\t *  \t\t\t\t\t@Private",
-                "\t *  \t\t\t\t\t\t",
-                "\t *  \t\t\t\t@Constructors",
-                "\t *  \t\t\t\t\t@Public",
-                "\t *  \t\t\t\t\t\t$1()",
-                "\t *  \t\t\t\t@Methods",
-                "\t *  \t\t\t\t\t@Public",
-                "\t *  \t\t\t\t\t\t",
-                "\t*/",
-            "}",
-            ""
-        ])})
+        run_batch(self.view, edit, AddInnerClassCommand.render)
 
 class AddInnerClassCommentCommand(sublime_plugin.TextCommand):
+    @staticmethod
+    def render(region, facts):
+        return (region, Templates.render("inner_class_comment", facts.values()), True)
+
     def run(self, edit):
-        view = self.view
-        offset = view.substr(view.line(view.sel()[0]))
-        view.run_command("insert_snippet", { "contents": ("\n").join([
-            "/**",
-            " *  ===${1/./=/g}===",
-            " *     $1",
-            " *  ===${1/./=/g}===",
-            " *  " + AddCurrentVersionCommand.get_current_version(view),
-            " *  \t@Created",
-            " *  \t@Description",
-            " *  \t@Added",
-            " *  \t\t@" + AddCurrentVersionCommand.get_class_name(view),
-            " *  \t\t\t@$1",
-            " *  \t\t\t\t@Variables",
-            " *  \t\t\t\t\t@Private",
-            " *  \t\t\t\t\t\t",
-            " *  \t\t\t\t@Constructors",
-            " *  \t\t\t\t\t@Public",
-            " *  \t\t\t\t\t\t$1()",
-            " *  \t\t\t\t@Methods",
-            " *  \t\t\t\t\t@Public",
-            " *  \t\t\t\t\t\t",
-            "*/",
-        ])})
+        run_batch(self.view, edit, AddInnerClassCommentCommand.render)
 
 class AddMethodCommentCommand(sublime_plugin.TextCommand):
-    def run(self, edit):
+    def render(self, region, facts):
         view = self.view
-        line_region = view.line(view.sel()[0])
+        line_region = view.line(region)
         line = view.substr(line_region)
-        header_region = AddCurrentVersionCommand.get_header_region(view)
-        is_header = header_region.contains(line_region)
-        
-        class_name = AddCurrentVersionCommand.get_class_name(view)
-        border = "=" * (len(class_name) + 6)
-        is_test = AddCurrentVersionCommand.is_test(view)
-
-        if re.match(".*\\*.*", line):
-            # inside a comment
-            line_delimiter = "\n" + re.findall(r"^(.*)(?=\*)", line)[-1] + "*  "
-            version = AddCurrentVersionCommand.get_current_version_from_header(view, header_region)
-            footer = "\t"
-
-            # in the header
-            if is_header:
-                version = re.sub(r"\d+$", str(int(re.findall(r"\d+$", version)[-1]) + 1), version)
-                footer = line_delimiter.join([
-                    "\t@Date",
-                    "\t\t" + AddDateCommand.get_today(),
-                    "\t@Author",
-                    "\t\t" + view.settings().get('tm_fullname'),
-                    "\t@Created",
-                    "\t@Description",
-                    "\t@Added", 
-                    "\t\t@" + class_name,
-                    "\t\t\t@Variables",
-                    "\t\t\t\t@Private",
-                    "\t\t\t\t\t",
-                    "\t\t\t@Constructors",
-                    "\t\t\t\t@Public",
-                    "\t\t\t\t\t",
-                    "\t\t\t@Methods",
-                    "\t\t\t\t@Public",
-                    "\t\t\t\t\t",
-                    "\t\t\t@Static",
-                    "\t\t\t\t@Methods",
-                    "\t\t\t\t\t@Public",
-                    "\t\t\t\t\t\t",
-                    "\t\t\t@InnerClass",
-                    "\t\t\t\t@Constructors",
-                    "\t\t\t\t\t@Public",
-                    "\t\t\t\t\t\t",
-                    "\t\t\t\t@Methods",
-                    "\t\t\t\t\t@Public",
-                    "\t\t\t\t\t\t",
-                    "\t@Changed",
-                    "\t\t@" + class_name,
-                    "\t\t\t@Constructors",
-                    "\t\t\t\t@Public",
-                    "\t\t\t\t\t",
-                    "\t\t\t@Methods",
-                    "\t\t\t\t@Public",
-                    "\t\t\t\t\t",
-                    "\t\t\t@Static",
-                    "\t\t\t\t@Methods",
-                    "\t\t\t\t\t@Public",
-                    "\t\t\t\t\t\t",
-                    "\t\t\t@InnerClass",
-                    "\t\t\t\t@Constructors",
-                    "\t\t\t\t\t@Public",
-                    "\t\t\t\t\t\t",
-                    "\t\t\t\t@Methods",
-                    "\t\t\t\t\t@Public",
-                    "\t\t\t\t\t\t",
-                ])
-            view.replace(edit, line_region, line_delimiter.join([
-                re.sub("\\*.*", "" , line) + "*  " + version,
-                footer
-            ]))
-        else:
-            # not inside a comment
-            line_delimiter = "\n *  "
-            if view.sel()[0].begin() == 0: 
-                # in the header
-                if(is_test):
-                    tests = ""
-                else:
-                    tests = line_delimiter.join([
-                        "",
-                        "@UnitTests",
-                        "\t" + class_name + "_test"
-                    ])
-
-                view.run_command("insert_snippet", { "contents": line_delimiter.join([
-                    "/**",
-                    border,
-                    "   " + class_name + "   ",
-                    border + tests,
-                    "@Version-1.0.0",
-                    "\t@Date", 
-                    "\t\t" + AddDateCommand.get_today(), 
-                    "\t@Author", 
-                    "\t\t" + view.settings().get('tm_fullname'), 
-                    "\t@Created",
-                    "\t@Description",
-                    "\t@Added",  
-                    "\t\t@" + class_name, 
-                    "\t\t\t@Variables",
-                    "\t\t\t\t@Private",
-                    "\t\t\t\t\t",
-                    "\t\t\t@Constructors",
-                    "\t\t\t\t@Public",
-                    "\t\t\t\t\t",
-                    "\t\t\t@Methods",
-                    "\t\t\t\t@Public",
-                    "\t\t\t\t\t\t\t",
-                    "\t\t\t@Static",
-                    "\t\t\t\t@Methods",
-                    "\t\t\t\t\t@Public",
-                    "\t\t\t\t\t\t",
-                    "\t\t\t@InnerClass",
-                    "\t\t\t\t@Constructors",
-                    "\t\t\t\t\t@Public",
-                    "\t\t\t\t\t\t",
-                    "\t\t\t\t@Methods",
-                    "\t\t\t\t\t@Public",
-                    "\t\t\t\t\t\t",
-                ]) + "\n*/"})
-            else:
-                # not in the header
-                lines = [
-                    "/**"
-                ]
-
-                lines.extend([
-                    AddCurrentVersionCommand.get_current_version(view),
-                    "\t@Created",
-                    "\t@Throws",
-                    "\t\t@Exception",
-                    "\t\t\t@When",
-                    "\t\t\t\t",
-                    "\t@Sets",
-                    "\t\t", 
-                    "\t@Returns",
-                    "\t\t$1"
-                ])
-                view.run_command("insert_snippet", { "contents": line_delimiter.join(lines) + "\n*/"})
+        class_name = facts.class_name
+
+        if facts.header_region.contains(line_region):
+            # In the header: a new @Version entry after the latest one's subtree.
+            edit = bump.version_entry_edit(facts.doc_comment, Templates.get("version_entry"), facts.values())
+            if edit is None:
+                sublime.status_message("MavensMate Util: no @Version in the header")
+                return None
+            return (sublime.Region(edit[0], edit[1]), edit[2])
+        decoration = re.match(r"[ \t]*\*", line)
+        if decoration is not None:
+            # In a method comment: the header's current version on this line.
+            version = facts.index.version
+            if version is None:
+                sublime.status_message("MavensMate Util: no @Version in the header")
+                return None
+            line_delimiter = "\n" + decoration.group(0) + "  "
+            return (line_region, decoration.group(0) + "  " + version + line_delimiter + "\t")
+        if region.begin() == 0:
+            # Above the class: the header scaffold.
+            return (region, Templates.render("header", facts.values(
+                border="=" * (len(class_name) + 6),
+                test_class_name=ProjectIndexes.test_class_name(view, class_name)
+            )), True)
+        return (region, Templates.render("method_comment", facts.values()), True)
+
+    def run(self, edit):
+        run_batch(self.view, edit, self.render)
+
+class DocumentAllMethodsCommand(sublime_plugin.TextCommand):
+    # The method_comment scaffold above every method and constructor that has no
+    # /** */ block yet: one scan, one render, one back-to-front edit.
+    @staticmethod
+    def edits(view):
+        comment = BatchEdit.expand_snippet(Templates.render("method_comment", ViewFacts(view).values()))
+        return apex.method_comment_edits(view.substr(sublime.Region(0, view.size())), comment)
+
+    def run(self, edit):
+        view = self.view
+        run_in_background(view, "DocumentAllMethodsCommand.edits", lambda: DocumentAllMethodsCommand.edits(view),
+            lambda edits: sublime.status_message("Documented %d method%s" % (len(edits), "" if len(edits) == 1 else "s")))
+
+class CompactHeadersCommand(sublime_plugin.TextCommand):
+    # Removes empty placeholder tags from every doc comment in the file, scanned in
+    # the background and applied as one edit.
+    def run(self, edit):
+        view = self.view
+        run_in_background(view, "CompactHeadersCommand.edits", lambda: compact.compact_edits(view.substr(sublime.Region(0, view.size()))),
+            lambda edits: sublime.status_message("Compacted headers: %d characters saved, %d left" % (compact.saved(edits), view.size())))
 
 class AddVariableCommentCommand(sublime_plugin.TextCommand):
     def run(self, edit):
@@ -672,43 +716,20 @@ class AddDescriptionCommentCommand(sublime_plugin.TextCommand):
         self.view.run_command("insert_snippet", { "contents": "@Description\n*  \t"})
 
 class AddTestMethodCommand(sublime_plugin.TextCommand):
-    def run(self, edit):
+    def render(self, region, facts):
         view = self.view
-        offset= len(WrapSelectionAsTitleCommand.replace_tabs_with_spaces(view, view.substr(view.full_line(view.sel()[0]))))
-        class_name = AddCurrentVersionCommand.get_class_name(view)
-        if class_name.endswith('_Test'):
-            class_name = class_name[:-5]
-
-        view.run_command("insert_snippet", { 
-            "contents": "\n".join([
-                "@IsTest",
-                "public static void test${1:Utilites}() {",
-                "\t" + "\n\t".join([
-                    "/**",
-                    " *  " + AddCurrentVersionCommand.get_current_version(view),
-                    " *  \t@Created",
-                    " *  \t@Description",
-                    " *  \t@Added",
-                    " *  \t\t@" + class_name,
-                    " *  \t\t\t@$1",
-                    " *  \t\t\t\t@Constructors",
-                    " *  \t\t\t\t\t",
-                    " *  \t\t\t\t@Methods",
-                    " *  \t\t\t\t\t",
-                    "*/",
-                    "// Data",
-                    "",
-                    WrapSelectionAsTitleCommand.get_title("Start Test", offset),
-                    "Test.startTest();"
-                    "",
-                    "",
-                    "",
-                    "Test.stopTest();",
-                    WrapSelectionAsTitleCommand.get_title("Stop Test", offset)
-                ]),
-                "}"
-            ])
-        })        
+        offset= len(WrapSelectionAsTitleCommand.replace_tabs_with_spaces(view, view.substr(view.full_line(region)), facts.tab_size))
+        class_name = ProjectIndexes.class_under_test(view, facts.class_name)
+
+        return (region, Templates.render("test_method", facts.values(
+            class_name=class_name,
+            method_name="Utilites",
+            start_test_title=WrapSelectionAsTitleCommand.get_title("Start Test", offset),
+            stop_test_title=WrapSelectionAsTitleCommand.get_title("Stop Test", offset)
+        )), True)
+
+    def run(self, edit):
+        run_batch(self.view, edit, self.render)
 
 class WrapSelectionAsTitleCommand(sublime_plugin.TextCommand):
     # See https://github.com/mborgerson/Pad/blob/master/pad.py
@@ -716,34 +737,97 @@ class WrapSelectionAsTitleCommand(sublime_plugin.TextCommand):
 
     @staticmethod
     def get_title(title, offset):
-        fill_width = 110 - offset
-        if title:
-            fill_width = (fill_width - len(title) - 7) // 2
-        else:
-            title = ""
-        fill_char = "-"
-        return "// " + (fill_char * fill_width) + "  " + title + "  " + (fill_char * fill_width)
+        return titles.get_title(title, offset)
 
     @staticmethod
-    def replace_tabs_with_spaces(view, text):
-        if text:
-            return re.sub(r"\t", " " * view.settings().get("tab_size"), text, 0, re.MULTILINE)
-        else:
-            return ""
+    def replace_tabs_with_spaces(view, text, tab_size=None):
+        if tab_size is None:
+            tab_size = view.settings().get("tab_size")
+        return titles.replace_tabs_with_spaces(text, tab_size)
 
-    def run(self, edit, fill_char="-", width=110, align_char=">"):
+    def run(self, edit, fill_char="-", width=titles.TITLE_WIDTH, align_char=">"):
         # Decorate each region.
         view = self.view
-        for region in view.sel():
-            line = view.line(region)
-            if region.empty():
-                # No text selected, pad entire line title.
-                title = view.substr(line)
-                offset = 0
-                replace_region = line
-            else:
-                # Pad inside selected region.
-                title = view.substr(region)
-                offset = len(WrapSelectionAsTitleCommand.replace_tabs_with_spaces(view, view.substr(line)[:-len(title)]))
-                replace_region = region
-            view.replace(edit, replace_region, WrapSelectionAsTitleCommand.get_title(title, offset))
\ No newline at end of file
+        run_batch(view, edit, lambda region, facts: titles.title_change(view, region, facts.tab_size))
+
+class ResizeSectionTitlesCommand(sublime_plugin.TextCommand):
+    # Refits every "// ----  Title  ----" ruler in the buffer to its line's indent:
+    # one find_all sweep, then only ruler lines are read and rewritten, back to front.
+    # Runs in the background unless wait is set, as it is on save.
+    @staticmethod
+    def edits(view, width=titles.TITLE_WIDTH):
+        tab_size = view.settings().get("tab_size")
+        edits = []
+        for line in view.find_all(titles.RULER_PATTERN):
+            change = titles.ruler_change(view.substr(line), tab_size, width)
+            if change is not None:
+                edits.append([line.begin() + change[0], line.begin() + change[1], change[2]])
+        return edits
+
+    def run(self, edit, width=titles.TITLE_WIDTH, wait=False):
+        view = self.view
+        if wait:
+            MavensmateUtilApplyEditsCommand.run(self, edit, ResizeSectionTitlesCommand.edits(view, width))
+        else:
+            run_in_background(view, "ResizeSectionTitlesCommand.edits", lambda: ResizeSectionTitlesCommand.edits(view, width))
+
+class ScaffoldApexTestsCommand(sublime_plugin.WindowCommand):
+    # Writes <Class>_Test classes, or adds the missing test methods, for every class
+    # under the given folders (the project folders by default) whose source changed
+    # since the last run. Runs in one background thread: the plugin host cannot fork
+    # a process pool, which the command line tool uses instead.
+    def run(self, paths=[]):
+        # Imported here to keep concurrent.futures and argparse out of plugin startup.
+        from .mavensmate_util import cli
+        window = self.window
+        paths = paths or window.folders()
+        if not paths:
+            sublime.status_message("Scaffold Apex tests needs a folder")
+            return
+        view = window.active_view()
+        settings = view.settings() if view is not None else sublime.load_settings("Preferences.sublime-settings")
+        cache_file = ProjectIndexes.cache_file(paths, "scaffold")
+        @perf.timed("ScaffoldApexTestsCommand.scaffold")
+        def scaffold():
+            templates = dict([(name, Templates.get(name)) for name in ("header", "test_class", "test_method")])
+            results, summary = cli.scaffold_paths(paths, templates, cache_file, settings.get("tm_fullname") or "", settings.get("tab_size", 4))
+            errors = summary["errors"]
+            if perf.debug:
+                for error in errors:
+                    print("MavensMate Util: %s: %s" % (error["path"], error["error"]))
+            sublime.status_message("Scaffolded %d test classes and extended %d (%d test methods), %d classes unchanged%s" % (
+                summary["created"], summary["extended"], summary["methods"], summary["skipped"],
+                ", %d errors, first %s: %s" % (len(errors), os.path.basename(errors[0]["path"]), errors[0]["error"]) if errors else ""))
+            index = ProjectIndexes.get(window)
+            if index is not None:
+                ProjectIndexes.build(index)
+        threading.Thread(target=scaffold, daemon=True).start()
+
+class MavensmateUtilPerformanceReportCommand(sublime_plugin.WindowCommand):
+    def run(self):
+        view = self.window.new_file()
+        view.set_name("MavensMate Util: Performance Report")
+        view.set_scratch(True)
+        view.run_command("append", { "characters": perf.format_report() + "\n" })
+        view.set_read_only(True)
+
+def instrument(namespace):
+    # Times every command run and listener callback defined in this module.
+    def view_size(index):
+        return lambda args: args[index].size() if len(args) > index and hasattr(args[index], "size") else None
+    for value in list(namespace.values()):
+        if not isinstance(value, type) or value.__module__ != __name__:
+            continue
+        if issubclass(value, sublime_plugin.TextCommand):
+            size = lambda args: args[0].view.size()
+        elif issubclass(value, sublime_plugin.EventListener):
+            size = view_size(1)
+        else:
+            continue
+        for name, function in list(value.__dict__.items()):
+            if callable(function) and (name == "run" or name.startswith("on_")):
+                setattr(value, name, perf.timed("%s.%s" % (value.__name__, name), size)(function))
+
+instrument(globals())
+
+_load_time = time.perf_counter() - _load_started
@@ -0,0 +1,2 @@
+# Editor-independent logic behind the MavensMate Util commands. Nothing in this
+# package imports sublime, so it can be used from scripts and benchmarks.
@@ -0,0 +1,124 @@
+import bisect
+import re
+
+from . import outline
+
+# Patterns shared by the editor commands (through view.find) and the headless tools.
+HEADER_PATTERN = "^\\/\\*\\*([\\s\\S]*?)\\*\\/"
+VERSION_PATTERN = "(@Version-[0-9\\.]+)"
+CONSOLE_VERSION_PATTERN = "console\\.log\\('Version: \\d+'\\);"
+
+CONSOLE_PREFIX_LENGTH = len("console.log('Version: ")
+CONSOLE_SUFFIX_LENGTH = len("');")
+
+_version = re.compile(VERSION_PATTERN)
+_console_version = re.compile(r"console\.log\('Version: (\d+)'\);")
+# String literals are matched too, and passed over, so '//' or '/*' inside one
+# opens no comment. Apex strings end at the line, as in the outline lexer.
+_comments = re.compile(r"'(?:\\[^\n]|[^'\\\n])*'?|/\*[\s\S]*?\*/|//[^\n]*")
+_method = re.compile(r"^([ \t]*)(?:@\w+(?:\([^)\n]*\))?[ \t]+)*(?:(?:public|private|protected|global|static|virtual|override|abstract|webservice|testmethod)[ \t]+)+(?:[\w.<>,\[\] ]+?[ \t]+)?\w+[ \t]*\([^;{}()]*\)[ \t\r\n]*\{", re.MULTILINE | re.IGNORECASE)
+_annotation = re.compile(r"[ \t]*@\w+(?:\([^)\n]*\))?[ \t]*\r?$")
+_unit_tests = re.compile(r"@UnitTests[ \t]*\r?\n((?:[ \t]*\*[ \t]+\w+[ \t]*\r?\n)+)")
+
+def find_header(text, limit=None):
+    # Linear equivalent of HEADER_PATTERN: the first "/**" at a line start and the
+    # "*/" after it. An unterminated comment ends the search instead of rescanning.
+    end = len(text) if limit is None else min(len(text), limit)
+    position = 0
+    while True:
+        begin = text.find("/**", position, end)
+        if begin < 0:
+            return None
+        if begin == 0 or text[begin - 1] == "\n":
+            close = text.find("*/", begin + 3, end)
+            if close < 0:
+                return None
+            return (begin, close + 2)
+        position = begin + 1
+
+def find_versions(header_text):
+    return _version.findall(header_text)
+
+def latest_version(header_text):
+    versions = find_versions(header_text)
+    return versions[-1] if versions else None
+
+def bump_version(version):
+    return re.sub(r"\d+$", lambda match: str(int(match.group(0)) + 1), version)
+
+def find_class_name(text):
+    # The first class declaration outside comments and strings.
+    return outline.declaration(text)[0]
+
+def find_unit_tests(header_text):
+    # Test class names listed under @UnitTests.
+    match = _unit_tests.search(header_text)
+    return re.findall(r"\*[ \t]+(\w+)", match.group(1)) if match else []
+
+def is_test(text):
+    # True when that class is annotated @IsTest.
+    return outline.is_test_annotated(outline.declaration(text)[1])
+
+def console_version_marker(begin, marker):
+    # (begin, end, version) of the number inside a console.log('Version: N'); match.
+    number_begin = begin + CONSOLE_PREFIX_LENGTH
+    number_end = begin + len(marker) - CONSOLE_SUFFIX_LENGTH
+    return (number_begin, number_end, int(marker[CONSOLE_PREFIX_LENGTH:-CONSOLE_SUFFIX_LENGTH]))
+
+def find_console_versions(text, limit=None):
+    end = len(text) if limit is None else min(len(text), limit)
+    return [(match.start(1), match.end(1), int(match.group(1))) for match in _console_version.finditer(text, 0, end)]
+
+def console_version_edits(markers):
+    return [[begin, end, str(version + 1)] for begin, end, version in markers]
+
+def apply_edits(text, edits):
+    # Edits are [begin, end, replacement] against the original text.
+    parts = []
+    position = 0
+    for begin, end, replacement in sorted(edits):
+        parts.append(text[position:begin])
+        parts.append(replacement)
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
+
+def comment_spans(text):
+    # (begin, end) of every block and line comment, in order.
+    return [match.span() for match in _comments.finditer(text) if match.group()[0] != "'"]
+
+def strip_comments(text):
+    # text without its block and line comments; string literals are kept whole.
+    return _comments.sub(lambda match: match.group() if match.group()[0] == "'" else "", text)
+
+def is_documented(text, position):
+    # True when the last non-blank text before position closes a /** */ block.
+    end = position
+    while end > 0 and text[end - 1] in " \t\r\n":
+        end -= 1
+    return text.startswith("*/", end - 2) and text.rfind("/**", 0, end) > text.rfind("*/", 0, end - 2)
+
+def find_undocumented_methods(text):
+    # (position, indent) for every method and constructor with a body and no /** */
+    # above it; position is the start of its first annotation line, if any.
+    spans = comment_spans(text)
+    starts = [begin for begin, end in spans]
+    found = []
+    for match in _method.finditer(text):
+        index = bisect.bisect_right(starts, match.start()) - 1
+        if index >= 0 and match.start() < spans[index][1]:
+            continue
+        position = match.start()
+        while position > 0:
+            line_start = text.rfind("\n", 0, position - 1) + 1
+            if not _annotation.match(text, line_start, position - 1):
+                break
+            position = line_start
+        if not is_documented(text, position):
+            found.append((position, match.group(1)))
+    return found
+
+def method_comment_edits(text, comment):
+    # [position, position, comment] inserting the rendered method_comment scaffold,
+    # indented to match, above every undocumented method.
+    return [[position, position, indent + comment.replace("\n", "\n" + indent) + "\n"] for position, indent in find_undocumented_methods(text)]
@@ -0,0 +1,99 @@
+import os
+import xml.etree.ElementTree as ElementTree
+
+from . import apex, doc_comment, outline
+
+# Repository checks for CI, run on file text alone (no org connection). Each file
+# is audited on its own; only the @UnitTests check needs every class name, so it
+# runs over the per-file results afterwards.
+
+# Version of the per-file result layout kept in the audit cache.
+FORMAT = 1
+
+CHECKS = [
+    ("header", "class header (/** ... */) before the class declaration"),
+    ("version_order", "@Version entries in increasing order"),
+    ("duplicate_version", "each @Version entry once"),
+    ("unit_tests", "@UnitTests names existing test classes"),
+    ("test_naming", "@IsTest classes named <Class>_Test")
+]
+
+def version_key(version):
+    # "@Version-1.0.10" -> (1, 0, 10)
+    return tuple([int(part) for part in version[len("@Version-"):].split(".") if part])
+
+def problem(check, message):
+    return { "check": check, "message": message }
+
+def audit_text(path, text):
+    # Facts and problems for one class. The class name falls back to the file name.
+    name, annotations, begin = outline.declaration(text)
+    class_name = name or os.path.splitext(os.path.basename(path))[0]
+    is_test = outline.is_test_annotated(annotations)
+    header = apex.find_header(text)
+    problems = []
+
+    # A license comment or banner may come first; the header only has to precede the class.
+    if header is None or (begin >= 0 and header[0] > begin):
+        problems.append(problem("header", "no class header"))
+        header_text = ""
+    else:
+        header_text = text[header[0]:header[1]]
+
+    # The header's @Version entries as the editor and bump read them.
+    versions = [found[0] for found in [apex.find_versions("@" + node.tag) for node in doc_comment.DocComment(header_text).versions] if found]
+    seen = set()
+    for previous, version in zip([None] + versions, versions):
+        if version in seen:
+            problems.append(problem("duplicate_version", "%s appears more than once" % version))
+        elif previous is not None and version_key(version) <= version_key(previous):
+            problems.append(problem("version_order", "%s follows %s" % (version, previous)))
+        seen.add(version)
+
+    if is_test and not class_name.lower().endswith("_test"):
+        problems.append(problem("test_naming", "@IsTest class %s does not end in _Test" % class_name))
+
+    return {
+        "class_name": class_name,
+        "is_test": is_test,
+        "unit_tests": apex.find_unit_tests(header_text),
+        "problems": problems
+    }
+
+def cross_check(results):
+    # Adds unit_tests problems now that every class name is known. results maps
+    # path to audit_text results (or {"error"}); returns them with all problems.
+    classes = set([result["class_name"].lower() for result in results.values() if "error" not in result])
+    checked = {}
+    for path, result in results.items():
+        if "error" in result:
+            checked[path] = result
+            continue
+        missing = [problem("unit_tests", "@UnitTests names %s, which is not in the tree" % test) for test in result["unit_tests"] if test.lower() not in classes]
+        checked[path] = dict(result, problems=result["problems"] + missing)
+    return checked
+
+def junit(results):
+    # One testsuite per check and one testcase per class, as JUnit XML.
+    root = ElementTree.Element("testsuites", name="mavensmate-util audit")
+    paths = sorted(results)
+    for check, description in CHECKS:
+        suite = ElementTree.SubElement(root, "testsuite", name=check)
+        failures = 0
+        errors = 0
+        for path in paths:
+            result = results[path]
+            case = ElementTree.SubElement(suite, "testcase", name=result.get("class_name", path), classname=check, file=path)
+            if "error" in result:
+                ElementTree.SubElement(case, "error", message=result["error"])
+                errors += 1
+                continue
+            messages = [found["message"] for found in result["problems"] if found["check"] == check]
+            if messages:
+                failure = ElementTree.SubElement(case, "failure", message=messages[0], type=check)
+                failure.text = "%s: expected %s\n%s" % (path, description, "\n".join(messages))
+                failures += 1
+        suite.set("tests", str(len(paths)))
+        suite.set("failures", str(failures))
+        suite.set("errors", str(errors))
+    return ElementTree.tostring(root, encoding="unicode")
@@ -0,0 +1,87 @@
+from . import apex, doc_comment, views
+
+# The same rewrites AddMethodCommentCommand (in the header) and
+# IncrementConsoleVersionCommand make, applied to whole files.
+
+APEX_EXTENSIONS = (".cls", ".trigger")
+CONSOLE_EXTENSIONS = (".js", ".page")
+
+# Byte markers a file must contain before it is worth decoding.
+APEX_MARKER = b"@Version-"
+CONSOLE_MARKER = b"console.log('Version: "
+
+def marker_for(path):
+    if path.endswith(APEX_EXTENSIONS):
+        return APEX_MARKER
+    if path.endswith(CONSOLE_EXTENSIONS):
+        return CONSOLE_MARKER
+    return None
+
+def version_entry_edit(comment, entry_template, values, newline="\n"):
+    # [position, position, text] appending a bumped @Version entry after the subtree
+    # of the latest one in comment (a DocComment), or None without a version. values
+    # are the template slots; version is set to the new one.
+    latest = comment.latest
+    if latest is None:
+        return None
+    star = latest.prefix.find("*")
+    line_delimiter = newline + (latest.prefix[:star] + "*  " if star >= 0 else latest.prefix)
+    new_version = apex.bump_version("@" + latest.tag)
+    entry = entry_template.render(dict(values, version=new_version), line_delimiter)
+    position = comment.line_end(latest)
+    if comment.text[latest.last - 1:latest.last] == "\r":
+        position -= 1
+    return [position, position, line_delimiter + new_version + line_delimiter + entry]
+
+def header_version_edit(text, entry_template, author=""):
+    # (edit, version, new version) for the class header, or None.
+    header = apex.find_header(text)
+    if header is None:
+        return None
+    begin, end = header
+    comment = doc_comment.DocComment(text[begin:end], begin)
+    # New lines use the file's own line endings.
+    edit = version_entry_edit(comment, entry_template, {
+        "class_name": apex.find_class_name(text),
+        "date": views.today(),
+        "author": author,
+        "is_test": apex.is_test(text)
+    }, "\r\n" if "\r\n" in text else "\n")
+    if edit is None:
+        return None
+    return (edit, comment.latest_version, apex.bump_version(comment.latest_version))
+
+def bump_edits(path, text, entry_template, author=""):
+    # Returns [begin, end, text] edits and a list of {"kind", "from", "to"} changes.
+    changes = []
+    edits = []
+    if path.endswith(APEX_EXTENSIONS):
+        result = header_version_edit(text, entry_template, author)
+        if result is not None:
+            edit, version, new_version = result
+            edits.append(edit)
+            changes.append({ "kind": "header", "from": version, "to": new_version })
+    elif path.endswith(CONSOLE_EXTENSIONS):
+        markers = apex.find_console_versions(text)
+        edits = apex.console_version_edits(markers)
+        for begin, end, version in markers:
+            changes.append({ "kind": "console", "from": version, "to": version + 1 })
+    return edits, changes
+
+def skip_reason(path, text):
+    # Why bump_edits leaves an Apex file's header alone, or None.
+    if not path.endswith(APEX_EXTENSIONS):
+        return None
+    header = apex.find_header(text)
+    if header is None:
+        return "no class header"
+    if doc_comment.DocComment(text[header[0]:header[1]]).latest is None:
+        return "no @Version in the class header"
+    return None
+
+def bump_text(path, text, entry_template, author=""):
+    # Returns the new text and the changes bump_edits made.
+    edits, changes = bump_edits(path, text, entry_template, author)
+    if not edits:
+        return text, changes
+    return apex.apply_edits(text, edits), changes
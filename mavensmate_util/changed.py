@@ -0,0 +1,166 @@
+import hashlib
+import re
+import threading
+
+# Methods changed since the last save, listed under the latest @Version's @Changed
+# section the way the version_entry scaffold lays it out:
+#
+#  *  	@Changed
+#  *  		@AccountService
+#  *  			@Methods
+#  *  				@Public
+#  *  					updateContacts
+#
+# Body hashes are kept per method name (one per overload). On save only methods on
+# lines the outline saw change since the previous save, and their overloads, are
+# read and hashed again.
+
+VISIBILITY = [("global", "Public"), ("public", "Public"), ("protected", "Protected"), ("private", "Private")]
+
+def qualified_name(node):
+    # Method name prefixed by its inner classes, not by the outer class.
+    names = [node.name]
+    owner = node.parent
+    while owner is not None and owner.parent is not None:
+        names.append(owner.name)
+        owner = owner.parent
+    return ".".join(reversed(names))
+
+def digest(tree, node, read):
+    end = node.end if node.end is not None else tree.starts[-1]
+    return hashlib.sha1(read(node.begin, end).encode("utf-8")).hexdigest()
+
+def section(tree, node):
+    # Tags under @Changed/@<Class> for a method, e.g. ["Static", "Methods", "Public"].
+    row = tree.row(node.begin)
+    words = set(re.findall(r"\w+", tree.lines[row][:node.begin - tree.starts[row]].lower()))
+    visibility = "Private"
+    for word, tag in VISIBILITY:
+        if word in words:
+            visibility = tag
+            break
+    owner = node.parent
+    kind = "Constructors" if node.name.lower() == owner.name.lower() else "Methods"
+    if owner.parent is not None:
+        return ["InnerClass", kind, visibility]
+    if kind == "Methods" and "static" in words:
+        return ["Static", "Methods", visibility]
+    return [kind, visibility]
+
+class MethodHashes(object):
+    # Body hashes as of the last save. read(begin, end) returns buffer text.
+    def __init__(self, tree, read):
+        self.revision = tree.revision
+        self.hashes = {}
+        for node in tree.declarations():
+            if node.kind == "method":
+                self.hashes.setdefault(qualified_name(node), []).append(digest(tree, node, read))
+
+    def changed(self, tree, read):
+        # [method] whose body is not one the last save had under its name, new
+        # ones included; then makes the current bodies the baseline.
+        tree.classes
+        starts = tree.starts
+        touched = []
+        for first, last in tree.edited_since(self.revision):
+            touched.extend(tree.methods_between(starts[first], starts[min(last, len(starts) - 1)]))
+        changed = []
+        seen = set()
+        for node in touched:
+            name = qualified_name(node)
+            if name in seen:
+                continue
+            seen.add(name)
+            overloads = [method for method in node.parent.methods if method.name == node.name]
+            known = list(self.hashes.get(name, []))
+            digests = []
+            for method in overloads:
+                digests.append(digest(tree, method, read))
+                if digests[-1] in known:
+                    known.remove(digests[-1])
+                else:
+                    changed.append(method)
+            self.hashes[name] = digests
+        self.revision = tree.revision
+        return sorted(changed, key=lambda method: method.begin)
+
+_hashes = {}
+_lock = threading.Lock()
+
+def track(key, tree, read):
+    # Starts tracking a buffer, e.g. when it is loaded; later calls keep the baseline.
+    with _lock:
+        if key not in _hashes:
+            _hashes[key] = MethodHashes(tree, read)
+
+def since_save(key, tree, read):
+    # Methods changed since the last call, or [] for a buffer not tracked until now.
+    with _lock:
+        hashes = _hashes.get(key)
+        if hashes is None:
+            _hashes[key] = MethodHashes(tree, read)
+            return []
+        return hashes.changed(tree, read)
+
+def forget(key):
+    _hashes.pop(key, None)
+
+def changed_edits(comment, class_name, entries):
+    # [begin, end, text] edits adding each (tags, name) under the latest version's
+    # @Changed/@<class_name> in comment (a DocComment), creating missing tag lines.
+    # Names already listed are skipped; nothing is done without an @Changed tag.
+    latest = comment.latest
+    root = latest.child("Changed") if latest is not None else None
+    if root is None or not entries:
+        return []
+    text = comment.text
+    planned = {}
+    for tags, name in entries:
+        # The deepest tag that exists, and the tags still to be created below it.
+        node = root
+        path = [class_name] + tags
+        while path and node.child(path[0]) is not None:
+            node = node.child(path.pop(0))
+        if node not in planned:
+            planned[node] = (set([line.strip(" \t*\r") for line in text[node.end:node.last].split("\n")]), [])
+        listed, additions = planned[node]
+        if (path or name not in listed) and (path, name) not in additions:
+            additions.append((path, name))
+
+    edits = []
+    inserts = {}
+    for node, (listed, additions) in planned.items():
+        if not additions:
+            continue
+        lines = []
+        open_path = []
+        for path, name in sorted(additions, key=lambda addition: addition[0]):
+            # New tag lines are shared by the names that need them.
+            common = 0
+            while common < min(len(open_path), len(path)) and open_path[common] == path[common]:
+                common += 1
+            for depth in range(common, len(path)):
+                lines.append(root.prefix + "\t" * (node.depth + 1 + depth) + "@" + path[depth])
+            open_path = path
+            lines.append(root.prefix + "\t" * (node.depth + 1 + len(path)) + name)
+        placeholder = blank_line(text, node) if not node.children and not any(path for path, name in additions) else None
+        if placeholder is not None:
+            edits.append([comment.absolute(placeholder[0]), comment.absolute(placeholder[1]), "\n".join(lines)])
+        else:
+            inserts.setdefault(comment.line_end(node), []).append((-node.depth, "".join(["\n" + line for line in lines])))
+    # Several tags can end on the same line: one insert there, the deeper tag's lines first.
+    for position, texts in inserts.items():
+        edits.append([position, position, "".join([text for depth, text in sorted(texts)])])
+    return sorted(edits)
+
+def blank_line(text, node):
+    # (begin, end) of the first empty placeholder line under node, or None.
+    position = node.end + 1
+    while position <= node.last:
+        end = text.find("\n", position)
+        if end < 0 or end > node.last:
+            end = node.last
+        if not text[position:end].strip(" \t*\r"):
+            return (position, end)
+        position = end + 1
+    return None
@@ -0,0 +1,429 @@
+import argparse
+import concurrent.futures
+import difflib
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+
+from . import apex, audit, bump, compact, figlet, project_index, scaffold, template
+
+# Command line entry point: python -m mavensmate_util <command> ...
+
+def walk(paths, extensions):
+    for path in paths:
+        if os.path.isfile(path):
+            if path.endswith(extensions):
+                yield path
+            continue
+        for directory, directories, files in os.walk(path):
+            directories[:] = [name for name in directories if not name.startswith(".")]
+            for name in sorted(files):
+                if name.endswith(extensions):
+                    yield os.path.join(directory, name)
+
+def contains(path, marker):
+    # mmap lets files without the marker be skipped without reading them into Python.
+    with open(path, "rb") as source:
+        try:
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file.
+            return False
+        try:
+            return mapped.find(marker) >= 0
+        finally:
+            mapped.close()
+
+def read_text(path):
+    with open(path, encoding="utf-8", newline="") as source:
+        return source.read()
+
+# mkstemp creates files 0600; new files get the mode open() would give them. Read
+# once, as setting the umask to read it affects every thread.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+def write_atomic(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temporary = tempfile.mkstemp(dir=directory, prefix=".mavensmate-", suffix=".tmp")
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8", newline="") as target:
+            target.write(text)
+        if os.path.exists(path):
+            shutil.copymode(path, temporary)
+        else:
+            os.chmod(temporary, 0o666 & ~UMASK)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+def unified_diff(path, before, after):
+    return "".join(difflib.unified_diff(before.splitlines(True), after.splitlines(True), path, path))
+
+def bump_file(job):
+    path, templates, author, dry_run = job
+    result = { "path": path, "changes": [], "skipped": False }
+    try:
+        marker = bump.marker_for(path)
+        if marker is None or not contains(path, marker):
+            result["skipped"] = True
+            return result
+        before = read_text(path)
+        after, result["changes"] = bump.bump_text(path, before, template.find("version_entry", templates), author)
+        if not result["changes"]:
+            # The file has the marker, so a header left alone is worth saying why.
+            result["reason"] = bump.skip_reason(path, before)
+            result["skipped"] = result["reason"] is not None
+        if after != before:
+            if dry_run:
+                result["diff"] = unified_diff(path, before, after)
+            else:
+                write_atomic(path, after)
+    except (OSError, UnicodeDecodeError, ValueError) as error:
+        result["error"] = str(error)
+    return result
+
+def compact_file(job):
+    path, dry_run = job
+    result = { "path": path, "saved": 0, "skipped": False }
+    try:
+        if not contains(path, b"/**"):
+            result["skipped"] = True
+            return result
+        before = read_text(path)
+        edits = compact.compact_edits(before)
+        result["saved"] = compact.saved(edits)
+        if edits:
+            after = apex.apply_edits(before, edits)
+            if dry_run:
+                result["diff"] = unified_diff(path, before, after)
+            else:
+                write_atomic(path, after)
+    except (OSError, UnicodeDecodeError, ValueError) as error:
+        result["error"] = str(error)
+    return result
+
+def run_pool(function, jobs, workers):
+    if workers == 1:
+        return [function(job) for job in jobs]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, jobs, chunksize=32))
+
+def find_test_file(path, class_name):
+    directory = os.path.dirname(path)
+    for name in project_index.test_names(class_name):
+        candidate = os.path.join(directory, name + ".cls")
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+def find_template(name, templates):
+    # templates is a list of directories, or the templates themselves by name (the
+    # editor passes those, as they may come from a packed .sublime-package).
+    if isinstance(templates, dict):
+        return templates[name]
+    return template.find(name, templates)
+
+def scaffold_file(job):
+    path, templates, author, tab_size, known_hash, dry_run = job
+    result = { "path": path, "test_path": None, "added": [], "created": False, "skipped": False }
+    try:
+        text = read_text(path)
+        result["hash"] = scaffold.source_hash(text)
+        class_name = apex.find_class_name(text)
+        methods = scaffold.public_methods(text) if class_name and not apex.is_test(text) else []
+        if result["hash"] == known_hash or not methods:
+            result["skipped"] = True
+            return result
+
+        method_template = find_template("test_method", templates)
+        test_path = find_test_file(path, class_name)
+        if test_path is not None:
+            before = read_text(test_path)
+            after, result["added"] = scaffold.append_tests(before, method_template, class_name, methods, author, tab_size)
+        else:
+            test_path = os.path.join(os.path.dirname(path), class_name + "_Test.cls")
+            before = ""
+            # A new test class gets the line endings of the class it tests.
+            newline = "\r\n" if "\r\n" in text else "\n"
+            after = scaffold.test_class(find_template("header", templates), find_template("test_class", templates), method_template, class_name, methods, author, tab_size, newline)
+            result["created"] = True
+            result["added"] = methods
+        result["test_path"] = test_path
+
+        if after != before:
+            if dry_run:
+                result["diff"] = unified_diff(test_path, before, after)
+            else:
+                write_atomic(test_path, after)
+                if result["created"] and os.path.exists(path + "-meta.xml"):
+                    shutil.copyfile(path + "-meta.xml", test_path + "-meta.xml")
+    except (OSError, UnicodeDecodeError, ValueError) as error:
+        result["error"] = str(error)
+    return result
+
+def load_hashes(path):
+    try:
+        with open(path, encoding="utf-8") as source:
+            data = json.load(source)
+    except (OSError, ValueError):
+        return {}
+    return data.get("hashes", {}) if data.get("format") == scaffold.CACHE_FORMAT else {}
+
+def save_hashes(path, hashes):
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    write_atomic(path, json.dumps({ "format": scaffold.CACHE_FORMAT, "hashes": hashes }))
+
+def scaffold_paths(paths, templates, cache_path, author="", tab_size=4, workers=1, dry_run=False, force=False):
+    # Generates or extends <Class>_Test for every class under paths whose source hash
+    # is not the one recorded in cache_path. Returns (results, summary).
+    hashes = {} if force else load_hashes(cache_path)
+    jobs = [(path, templates, author, tab_size, hashes.get(path), dry_run) for path in walk(paths, project_index.EXTENSIONS)]
+    results = run_pool(scaffold_file, jobs, workers)
+
+    if not dry_run:
+        for result in results:
+            if "error" not in result:
+                hashes[result["path"]] = result["hash"]
+        save_hashes(cache_path, hashes)
+
+    summary = {
+        "classes": len(results),
+        "created": sum(1 for result in results if result["created"] and "error" not in result),
+        "extended": sum(1 for result in results if result["added"] and not result["created"] and "error" not in result),
+        "methods": sum(len(result["added"]) for result in results if "error" not in result),
+        "skipped": sum(1 for result in results if result["skipped"]),
+        "dry_run": dry_run,
+        "errors": [{ "path": result["path"], "error": result["error"] } for result in results if "error" in result],
+        "tests": [{ "path": result["path"], "test_path": result["test_path"], "created": result["created"], "added": result["added"] } for result in results if result["added"] and "error" not in result]
+    }
+    return results, summary
+
+def audit_file(path):
+    try:
+        return audit.audit_text(path, read_text(path))
+    except (OSError, UnicodeDecodeError, ValueError) as error:
+        return { "error": str(error) }
+
+def load_audits(path):
+    try:
+        with open(path, encoding="utf-8") as source:
+            data = json.load(source)
+    except (OSError, ValueError):
+        return {}
+    return data.get("files", {}) if data.get("format") == audit.FORMAT else {}
+
+def save_audits(path, files):
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    write_atomic(path, json.dumps({ "format": audit.FORMAT, "files": files }))
+
+def audit_paths(paths, cache_path, workers=1, force=False):
+    # Audits every class under paths. Files whose content hash matches cache_path
+    # reuse their cached result; the rest go through the worker pool. Returns (results, summary).
+    cached = {} if force else load_audits(cache_path)
+    files = {}
+    results = {}
+    jobs = []
+    for path in walk(paths, project_index.EXTENSIONS):
+        try:
+            with open(path, "rb") as source:
+                digest = hashlib.sha1(source.read()).hexdigest()
+        except OSError as error:
+            results[path] = { "error": str(error) }
+            continue
+        entry = cached.get(path)
+        if entry is not None and entry["hash"] == digest:
+            results[path] = entry["result"]
+        else:
+            jobs.append(path)
+        files[path] = { "hash": digest }
+    for path, result in zip(jobs, run_pool(audit_file, jobs, workers)):
+        results[path] = result
+    for path in files:
+        files[path]["result"] = results[path]
+    save_audits(cache_path, dict([(path, entry) for path, entry in files.items() if "error" not in entry["result"]]))
+
+    results = audit.cross_check(results)
+    summary = {
+        "classes": len(results),
+        "audited": len(jobs),
+        "cached": len(files) - len(jobs),
+        "problems": sum(len(result.get("problems", [])) for result in results.values()),
+        "checks": dict([(check, sum(1 for result in results.values() for found in result.get("problems", []) if found["check"] == check)) for check, description in audit.CHECKS]),
+        "errors": [{ "path": path, "error": result["error"] } for path, result in sorted(results.items()) if "error" in result],
+        "files": [{ "path": path, "class_name": result["class_name"], "problems": result["problems"] } for path, result in sorted(results.items()) if result.get("problems")]
+    }
+    return results, summary
+
+def default_cache(paths, name="scaffold.json"):
+    root = os.path.commonpath([os.path.abspath(path) for path in paths])
+    if os.path.isfile(root):
+        root = os.path.dirname(root)
+    return os.path.join(root, ".mavensmate", name)
+
+def template_directories(arguments):
+    return ([arguments.templates] if arguments.templates else []) + [template.PACKAGE_TEMPLATES]
+
+def bump_command(arguments):
+    templates = template_directories(arguments)
+    jobs = [(path, templates, arguments.author, arguments.dry_run) for path in walk(arguments.paths, bump.APEX_EXTENSIONS + bump.CONSOLE_EXTENSIONS)]
+    results = run_pool(bump_file, jobs, arguments.jobs)
+
+    summary = {
+        "files": len(results),
+        "changed": sum(1 for result in results if result["changes"] and "error" not in result),
+        "skipped": sum(1 for result in results if result["skipped"]),
+        "dry_run": arguments.dry_run,
+        "errors": [{ "path": result["path"], "error": result["error"] } for result in results if "error" in result],
+        "changes": [dict(change, path=result["path"]) for result in results for change in result["changes"]],
+        "skipped_files": [{ "path": result["path"], "reason": result["reason"] } for result in results if result.get("reason")]
+    }
+    if arguments.json:
+        json.dump(summary, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        for result in results:
+            if "diff" in result:
+                sys.stdout.write(result["diff"])
+        for entry in summary["skipped_files"]:
+            sys.stderr.write("%s: skipped, %s\n" % (entry["path"], entry["reason"]))
+        for error in summary["errors"]:
+            sys.stderr.write("%s: %s\n" % (error["path"], error["error"]))
+        sys.stderr.write("%d files, %d %s, %d skipped\n" % (summary["files"], summary["changed"], "would change" if arguments.dry_run else "changed", summary["skipped"]))
+    return 1 if summary["errors"] else 0
+
+def scaffold_command(arguments):
+    results, summary = scaffold_paths(
+        arguments.paths,
+        template_directories(arguments),
+        arguments.cache or default_cache(arguments.paths),
+        arguments.author,
+        arguments.tab_size,
+        arguments.jobs,
+        arguments.dry_run,
+        arguments.force
+    )
+    if arguments.json:
+        json.dump(summary, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        for result in results:
+            if "diff" in result:
+                sys.stdout.write(result["diff"])
+        for error in summary["errors"]:
+            sys.stderr.write("%s: %s\n" % (error["path"], error["error"]))
+        sys.stderr.write("%d classes, %d test classes %s, %d extended, %d test methods, %d unchanged or skipped\n" % (
+            summary["classes"], summary["created"], "would be created" if arguments.dry_run else "created", summary["extended"], summary["methods"], summary["skipped"]))
+    return 1 if summary["errors"] else 0
+
+def compact_command(arguments):
+    jobs = [(path, arguments.dry_run) for path in walk(arguments.paths, bump.APEX_EXTENSIONS)]
+    results = run_pool(compact_file, jobs, arguments.jobs)
+
+    summary = {
+        "files": len(results),
+        "changed": sum(1 for result in results if result["saved"] and "error" not in result),
+        "saved": sum(result["saved"] for result in results if "error" not in result),
+        "skipped": sum(1 for result in results if result["skipped"]),
+        "dry_run": arguments.dry_run,
+        "errors": [{ "path": result["path"], "error": result["error"] } for result in results if "error" in result],
+        "compacted": [{ "path": result["path"], "saved": result["saved"] } for result in results if result["saved"] and "error" not in result]
+    }
+    if arguments.json:
+        json.dump(summary, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        for result in results:
+            if "diff" in result:
+                sys.stdout.write(result["diff"])
+        for entry in summary["compacted"]:
+            sys.stderr.write("%s: %d characters\n" % (entry["path"], entry["saved"]))
+        for error in summary["errors"]:
+            sys.stderr.write("%s: %s\n" % (error["path"], error["error"]))
+        sys.stderr.write("%d files, %d %s, %d characters saved\n" % (summary["files"], summary["changed"], "would be compacted" if arguments.dry_run else "compacted", summary["saved"]))
+    return 1 if summary["errors"] else 0
+
+def audit_command(arguments):
+    results, summary = audit_paths(arguments.paths, arguments.cache or default_cache(arguments.paths, "audit.json"), arguments.jobs, arguments.force)
+    if arguments.junit:
+        with open(arguments.junit, "w", encoding="utf-8") as target:
+            target.write(audit.junit(results))
+    if arguments.json:
+        json.dump(summary, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        for entry in summary["files"]:
+            for found in entry["problems"]:
+                sys.stdout.write("%s: %s: %s\n" % (entry["path"], found["check"], found["message"]))
+        for error in summary["errors"]:
+            sys.stderr.write("%s: %s\n" % (error["path"], error["error"]))
+        sys.stderr.write("%d classes, %d problems, %d audited, %d cached\n" % (summary["classes"], summary["problems"], summary["audited"], summary["cached"]))
+    return 1 if summary["problems"] or summary["errors"] else 0
+
+def serve_command(arguments):
+    from . import daemon
+    fonts = ([arguments.fonts] if arguments.fonts else []) + [figlet.PACKAGE_FONTS]
+    return daemon.serve(daemon.Server(template_directories(arguments), fonts, arguments.author, arguments.cache))
+
+def parser():
+    root = argparse.ArgumentParser(prog="python -m mavensmate_util")
+    commands = root.add_subparsers(dest="command")
+    commands.required = True
+
+    bump_parser = commands.add_parser("bump", help="add a bumped @Version entry to Apex headers and increment console.log('Version: N') markers")
+    bump_parser.add_argument("paths", nargs="+", help="files or Salesforce src folders")
+    bump_parser.add_argument("--dry-run", action="store_true", help="print a unified diff instead of writing")
+    bump_parser.add_argument("--json", action="store_true", help="print a JSON summary")
+    bump_parser.add_argument("--author", default="", help="value for {{author}} in the version entry")
+    bump_parser.add_argument("--templates", help="folder with template overrides")
+    bump_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    bump_parser.set_defaults(function=bump_command)
+
+    scaffold_parser = commands.add_parser("scaffold", help="write <Class>_Test classes, or add missing test methods to them, for public Apex methods")
+    scaffold_parser.add_argument("paths", nargs="+", help="files or Salesforce src folders")
+    scaffold_parser.add_argument("--dry-run", action="store_true", help="print a unified diff instead of writing")
+    scaffold_parser.add_argument("--json", action="store_true", help="print a JSON summary")
+    scaffold_parser.add_argument("--author", default="", help="value for {{author}} in new test class headers")
+    scaffold_parser.add_argument("--templates", help="folder with template overrides")
+    scaffold_parser.add_argument("--tab-size", type=int, default=4, help="tab width used to size the Start/Stop Test rulers")
+    scaffold_parser.add_argument("--cache", help="source hash cache (default: .mavensmate/scaffold.json under the common folder)")
+    scaffold_parser.add_argument("--force", action="store_true", help="ignore the source hash cache")
+    scaffold_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    scaffold_parser.set_defaults(function=scaffold_command)
+
+    compact_parser = commands.add_parser("compact", help="remove empty placeholder tags (@Variables, @Private, ...) from Apex doc comments")
+    compact_parser.add_argument("paths", nargs="+", help="files or Salesforce src folders")
+    compact_parser.add_argument("--dry-run", action="store_true", help="print a unified diff instead of writing")
+    compact_parser.add_argument("--json", action="store_true", help="print a JSON summary")
+    compact_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    compact_parser.set_defaults(function=compact_command)
+
+    audit_parser = commands.add_parser("audit", help="report missing class headers, out of order or duplicate @Version entries, unknown @UnitTests and misnamed test classes")
+    audit_parser.add_argument("paths", nargs="+", help="files or Salesforce src folders")
+    audit_parser.add_argument("--json", action="store_true", help="print a JSON summary")
+    audit_parser.add_argument("--junit", help="also write a JUnit XML report to this file")
+    audit_parser.add_argument("--cache", help="result cache keyed by content hash (default: .mavensmate/audit.json under the common folder)")
+    audit_parser.add_argument("--force", action="store_true", help="ignore the result cache")
+    audit_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    audit_parser.set_defaults(function=audit_command)
+
+    serve_parser = commands.add_parser("serve", help="answer JSON-RPC requests for headers, banners, rulers and version bumps on stdin/stdout")
+    serve_parser.add_argument("--author", default="", help="default value for {{author}}")
+    serve_parser.add_argument("--templates", help="folder with template overrides")
+    serve_parser.add_argument("--fonts", help="folder with FIGlet fonts")
+    serve_parser.add_argument("--cache", help="folder for compiled FIGlet fonts")
+    serve_parser.set_defaults(function=serve_command)
+    return root
+
+def main(argv=None):
+    arguments = parser().parse_args(argv)
+    return arguments.function(arguments)
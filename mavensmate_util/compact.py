@@ -0,0 +1,63 @@
+import re
+
+from . import apex, doc_comment
+
+# Removes the placeholder tags the class, inner class and version scaffolds leave
+# behind (@Added/@Foo/@Variables/@Private with nothing under them) from every
+# /** */ comment in a file, to keep classes under the org's Apex character limit.
+# Tags with a value anywhere below them, and tags such as @Created or @Date that
+# are not placeholders, are kept. So is the latest @Version's @Changed, which the
+# changed methods list is filled in under on save.
+
+PLACEHOLDER_TAGS = ("Added", "Changed", "Variables", "Private", "Public", "Protected", "Global", "Constructors", "Methods", "Static", "InnerClass")
+CLASS_SECTIONS = ("Added", "Changed")
+
+# Comments without any of these (method comments, most banners) are not parsed.
+_placeholder = re.compile(r"@(?:%s)\b" % "|".join(PLACEHOLDER_TAGS))
+
+def is_class_tag(node):
+    # @AccountService under @Added or @Changed, and inner class tags below it.
+    parent = node.parent
+    if parent is None or parent.tag is None:
+        return False
+    return parent.tag in CLASS_SECTIONS or (node.tag not in PLACEHOLDER_TAGS and is_class_tag(parent))
+
+def is_empty(node, text):
+    # True when node and everything below it are placeholder tags and blank lines.
+    if node.tag not in PLACEHOLDER_TAGS and not is_class_tag(node):
+        return False
+    if not all([is_empty(child, text) for child in node.children]):
+        return False
+    for line in text[node.end:node.last].split("\n")[1:]:
+        content = line.strip(" \t*\r")
+        if content and not content.startswith("@"):
+            return False
+    return True
+
+def empty_branches(comment):
+    # The outermost empty nodes of a DocComment, in order.
+    latest = comment.latest
+    kept = latest.child("Changed") if latest is not None else None
+    found = []
+    pending = list(reversed(comment.root.children))
+    while pending:
+        node = pending.pop()
+        if node is not kept and is_empty(node, comment.text):
+            found.append(node)
+        else:
+            pending.extend(reversed(node.children))
+    return found
+
+def compact_edits(text):
+    # [begin, end, ""] removing every empty branch, whole lines at a time.
+    edits = []
+    for begin, end in apex.comment_spans(text):
+        if not text.startswith("/**", begin) or not _placeholder.search(text, begin, end):
+            continue
+        comment = doc_comment.DocComment(text[begin:end], begin)
+        for node in empty_branches(comment):
+            edits.append([comment.absolute(node.begin), comment.line_end(node) + 1, ""])
+    return edits
+
+def saved(edits):
+    return sum([end - begin for begin, end, replacement in edits])
@@ -0,0 +1,298 @@
+import json
+import os
+import sys
+
+from . import apex, bump, cli, compact, doc_comment, figlet, outline, perf, stamps, template, titles, views
+
+# A long-lived JSON-RPC 2.0 server on stdin/stdout for editors other than Sublime and
+# for pre-commit scripts: python -m mavensmate_util serve. Messages are one JSON
+# value per line, or LSP style with a Content-Length header; replies use the same
+# framing as the request. Batches (JSON arrays) are answered with one array.
+#
+# File methods take "files", a list of paths or {"path", "text"} objects (text wins
+# over the file on disk, for unsaved buffers), and answer with one result per file
+# holding "edits": [begin, end, text] in character offsets of that text, back to
+# front safe in any order. Parsed headers and outlines, templates and fonts stay
+# cached between calls.
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+# Per-file failures are reported in that file's result, not as a JSON-RPC error.
+FILE_ERRORS = (OSError, UnicodeDecodeError, ValueError, KeyError, IndexError)
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code = code
+
+class Document(object):
+    # One file's text and the facts worked out from it, kept while the text is unchanged.
+    def __init__(self, path, text):
+        self.path = path
+        self.text = text
+        header = apex.find_header(text)
+        self.header = header
+        self.doc_comment = doc_comment.cached(path, header[0] if header else -1, text[header[0]:header[1]] if header else "")
+        self._outline = None
+
+    @property
+    def outline(self):
+        if self._outline is None:
+            self._outline = outline.cached(self.path, self.text)
+        return self._outline
+
+    def values(self, author, **extra):
+        # Template slots, as ViewFacts.values gives them in the editor.
+        values = {
+            "class_name": self.outline.class_name,
+            "version": self.doc_comment.latest_version,
+            "date": views.today(),
+            "author": author,
+            "is_test": self.outline.is_test
+        }
+        values.update(extra)
+        return values
+
+class Server(object):
+    def __init__(self, templates, fonts, author="", cache_directory=None):
+        self.templates = templates
+        self.fonts = fonts
+        self.author = author
+        self.cache_directory = cache_directory
+        self.documents = {}
+        self.running = True
+
+    # ----  Documents  ----
+
+    def document(self, file):
+        if isinstance(file, str):
+            file = { "path": file }
+        if not isinstance(file, dict) or not isinstance(file.get("path"), str):
+            raise RpcError(INVALID_PARAMS, "a file is a path or an object with a path")
+        path = file["path"]
+        text = file.get("text")
+        key = None
+        if text is None:
+            stat = os.stat(path)
+            key = (stat.st_mtime, stat.st_size)
+        cached = self.documents.get(path)
+        if cached is not None and (cached[0] == key if text is None else cached[1].text == text):
+            return cached[1]
+        document = Document(path, cli.read_text(path) if text is None else text)
+        self.documents[path] = (key, document)
+        return document
+
+    def each(self, params, function):
+        # {"files": [result per file]}; function(document) returns a dict of fields.
+        files = params.get("files")
+        if not isinstance(files, list):
+            raise RpcError(INVALID_PARAMS, "files must be a list")
+        results = []
+        for file in files:
+            path = file.get("path") if isinstance(file, dict) else file
+            try:
+                result = function(self.document(file))
+            except FILE_ERRORS as error:
+                result = { "error": str(error) }
+            result["path"] = path
+            results.append(result)
+        return { "files": results }
+
+    def author_for(self, params):
+        return params.get("author", self.author)
+
+    # ----  Methods  ----
+
+    def rpc_header(self, params):
+        # The class header for every Apex file that has none yet, inserted at the top.
+        author = self.author_for(params)
+        def header(document):
+            outer = document.outline.outer
+            if outer is None or (document.header is not None and document.header[0] < outer.begin):
+                return { "edits": [] }
+            class_name = outer.name
+            test_path = cli.find_test_file(document.path, class_name)
+            text = template.find("header", self.templates).render(document.values(author,
+                border="=" * (len(class_name) + 6),
+                test_class_name=os.path.splitext(os.path.basename(test_path))[0] if test_path else class_name + "_test"
+            ))
+            return { "edits": [[0, 0, views.BatchEdit.expand_snippet(text) + "\n"]] }
+        return self.each(params, header)
+
+    def rpc_method_comments(self, params):
+        # The method_comment scaffold above every undocumented method, as "Document All Methods" does.
+        author = self.author_for(params)
+        def method_comments(document):
+            comment = views.BatchEdit.expand_snippet(template.find("method_comment", self.templates).render(document.values(author)))
+            return { "edits": apex.method_comment_edits(document.text, comment) }
+        return self.each(params, method_comments)
+
+    def rpc_bump(self, params):
+        # A new @Version entry in Apex headers, console.log('Version: N') incremented elsewhere.
+        author = self.author_for(params)
+        def bump_document(document):
+            edits, changes = bump.bump_edits(document.path, document.text, template.find("version_entry", self.templates), author)
+            if not changes:
+                reason = bump.skip_reason(document.path, document.text)
+                if reason is not None:
+                    return { "edits": edits, "changes": changes, "skipped": reason }
+            return { "edits": edits, "changes": changes }
+        return self.each(params, bump_document)
+
+    def rpc_compact(self, params):
+        # Empty placeholder tags removed from every doc comment, with the characters saved.
+        def compact_document(document):
+            edits = compact.compact_edits(document.text)
+            return { "edits": edits, "saved": compact.saved(edits) }
+        return self.each(params, compact_document)
+
+    def rpc_stamps(self, params):
+        # The save stamp rewrites for each file; "stamp_files" and "stamp_rules" as in the settings.
+        def stamp(document):
+            rules = stamps.rules_for(document.path, params.get("stamp_files"), params.get("stamp_rules"))
+            if not rules:
+                return { "edits": [] }
+            scanner = stamps.scanner(rules)
+            return { "edits": scanner.edits(scanner.scan(document.text)) }
+        return self.each(params, stamp)
+
+    def rpc_resize_titles(self, params):
+        # Every "// ----  Title  ----" ruler refitted to its line's indent.
+        tab_size = params.get("tab_size", 4)
+        width = params.get("width", titles.TITLE_WIDTH)
+        def resize(document):
+            edits = []
+            position = 0
+            for line in document.text.split("\n"):
+                change = titles.ruler_change(line, tab_size, width)
+                if change is not None:
+                    edits.append([position + change[0], position + change[1], change[2]])
+                position += len(line) + 1
+            return { "edits": edits }
+        return self.each(params, resize)
+
+    def rpc_title(self, params):
+        # {"text"}: the section title ruler for "title" at "indent" (a string or a column).
+        indent = params.get("indent", 0)
+        if isinstance(indent, str):
+            indent = len(titles.replace_tabs_with_spaces(indent, params.get("tab_size", 4)))
+        return { "text": titles.get_title(params.get("title", ""), indent, params.get("width", titles.TITLE_WIDTH)) }
+
+    def rpc_figlet(self, params):
+        # {"text"}: "title" as a FIGlet banner comment, wrapped to the title width if "wrap".
+        if not isinstance(params.get("title"), str):
+            raise RpcError(INVALID_PARAMS, "title must be a string")
+        font = params.get("font")
+        try:
+            font = figlet.find(font, self.fonts, self.cache_directory) if font and font != figlet.DEFAULT_FONT else None
+        except (OSError, ValueError) as error:
+            raise RpcError(INVALID_PARAMS, str(error))
+        return { "text": "\n".join(figlet.render(params["title"], params.get("width", titles.TITLE_WIDTH) if params.get("wrap") else None, font)) }
+
+    def rpc_forget(self, params):
+        # Drops cached documents; all of them without "paths".
+        paths = params.get("paths")
+        for path in list(self.documents) if paths is None else paths:
+            self.documents.pop(path, None)
+            doc_comment.forget(path)
+            outline.forget(path)
+        return { "documents": len(self.documents) }
+
+    def rpc_stats(self, params):
+        return {
+            "documents": len(self.documents),
+            "methods": [{ "method": name, "calls": count, "p50_ms": p50 * 1000, "p95_ms": p95 * 1000, "max_ms": longest * 1000 } for name, count, p50, p95, longest in perf.report()]
+        }
+
+    def rpc_shutdown(self, params):
+        self.running = False
+        return None
+
+    # ----  Protocol  ----
+
+    def call(self, request):
+        # The response object for one request, or None for a notification.
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or not isinstance(request.get("method"), str):
+            return error_response(None, INVALID_REQUEST, "not a JSON-RPC 2.0 request")
+        method = request["method"]
+        params = request.get("params", {})
+        function = getattr(self, "rpc_" + method, None) if method.isidentifier() else None
+        try:
+            if function is None:
+                raise RpcError(METHOD_NOT_FOUND, "unknown method %s" % method)
+            if not isinstance(params, dict):
+                raise RpcError(INVALID_PARAMS, "params must be an object")
+            result = perf.timed(method)(function)(params)
+        except RpcError as error:
+            response = error_response(request.get("id"), error.code, str(error))
+        except Exception as error:
+            response = error_response(request.get("id"), INTERNAL_ERROR, "%s: %s" % (error.__class__.__name__, error))
+        else:
+            response = { "jsonrpc": "2.0", "id": request.get("id"), "result": result }
+        return response if "id" in request else None
+
+    def handle(self, message):
+        # The reply to one message, or None when there is nothing to send back.
+        try:
+            request = json.loads(message)
+        except ValueError as error:
+            return error_response(None, PARSE_ERROR, str(error))
+        if isinstance(request, list):
+            if not request:
+                return error_response(None, INVALID_REQUEST, "empty batch")
+            responses = [response for response in [self.call(item) for item in request] if response is not None]
+            return responses or None
+        return self.call(request)
+
+def error_response(id, code, message):
+    return { "jsonrpc": "2.0", "id": id, "error": { "code": code, "message": message } }
+
+def read_message(stream):
+    # (message, framed) with framed True for Content-Length messages; (None, False) at end of input.
+    # Raises ValueError, after the rest of the headers, for a Content-Length that is not a length.
+    while True:
+        line = stream.readline()
+        if not line:
+            return None, False
+        if not line.strip():
+            continue
+        if not line.lower().startswith(b"content-length:"):
+            return line.decode("utf-8"), False
+        header = line
+        while line.strip():
+            line = stream.readline()
+            if not line:
+                return None, False
+        value = header.split(b":", 1)[1].strip()
+        if not value.isdigit():
+            raise ValueError("bad Content-Length header: %s" % value.decode("utf-8", "replace"))
+        return stream.read(int(value)).decode("utf-8"), True
+
+def write_message(stream, response, framed):
+    body = json.dumps(response, separators=(",", ":")).encode("utf-8")
+    if framed:
+        stream.write(b"Content-Length: %d\r\n\r\n" % len(body))
+        stream.write(body)
+    else:
+        stream.write(body + b"\n")
+    stream.flush()
+
+def serve(server, input=None, output=None):
+    input = input or sys.stdin.buffer
+    output = output or sys.stdout.buffer
+    while server.running:
+        try:
+            message, framed = read_message(input)
+        except ValueError as error:
+            write_message(output, error_response(None, PARSE_ERROR, str(error)), True)
+            continue
+        if message is None:
+            break
+        response = server.handle(message)
+        if response is not None:
+            write_message(output, response, framed)
+    return 0
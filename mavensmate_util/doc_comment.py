@@ -0,0 +1,142 @@
+import copy
+import re
+
+# Parses a /** ... */ header into a tree of @tag nodes. Depth is the number of
+# tabs after the " *  " decoration, which is how the scaffolds nest tags:
+#
+#  *  @Version-1.0.1
+#  *  	@Added
+#  *  		@AccountService
+#  *  			@Methods
+#
+# Offsets are kept relative to the start of the comment so a tree can be reused
+# when text before the header moves it.
+
+_decoration = re.compile(r"[ \t]*\*[ ]{0,2}")
+_indent = re.compile(r"[ \t]*")
+
+# Columns a tab advances when the indent is measured.
+TAB_WIDTH = 4
+
+class Node(object):
+    __slots__ = ("tag", "depth", "begin", "end", "prefix", "parent", "children", "last")
+
+    def __init__(self, tag, depth, begin, end, prefix, parent):
+        self.tag = tag
+        self.depth = depth
+        # Relative offsets of the node's own line, without the newline.
+        self.begin = begin
+        self.end = end
+        # The decoration before the indent: " *  ".
+        self.prefix = prefix
+        self.parent = parent
+        self.children = []
+        # Last line belonging to this node or its descendants.
+        self.last = end
+
+    def child(self, tag):
+        for node in self.children:
+            if node.tag == tag:
+                return node
+        return None
+
+    def path(self, *tags):
+        node = self
+        for tag in tags:
+            node = node.child(tag)
+            if node is None:
+                return None
+        return node
+
+class DocComment(object):
+    def __init__(self, text, base=0):
+        self.text = text
+        self.base = base
+        self.root = Node(None, -1, 0, 0, "", None)
+        self.versions = []
+        self.parse()
+
+    def parse(self):
+        # Depth comes from each tag's visual indent after the decoration (tabs
+        # expanded), counted in steps of the smallest indent between tags, so
+        # space-indented headers nest too. Legacy lines without the " * " decoration
+        # are read the same way.
+        lines = []
+        columns = set()
+        position = 0
+        text = self.text
+        length = len(text)
+        while position <= length:
+            newline = text.find("\n", position)
+            end = length if newline < 0 else newline
+            line = text[position:end]
+            if line.lstrip().startswith("*/"):
+                break
+            if not line.lstrip().startswith("/**"):
+                decoration = _decoration.match(line)
+                prefix_end = decoration.end() if decoration is not None else 0
+                content_start = _indent.match(line, prefix_end).end()
+                column = None
+                if line.startswith("@", content_start):
+                    column = len(line[:content_start].expandtabs(TAB_WIDTH)) - len(line[:prefix_end].expandtabs(TAB_WIDTH))
+                    columns.add(column)
+                lines.append((position, end, line, prefix_end, content_start, column))
+            position = end + 1
+
+        margin = min(columns) if columns else 0
+        step = min([column - margin for column in columns if column > margin] or [TAB_WIDTH])
+        stack = [self.root]
+        for position, end, line, prefix_end, content_start, column in lines:
+            if column is not None:
+                depth = (column - margin + step // 2) // step
+                while stack[-1].depth >= depth:
+                    stack.pop()
+                parent = stack[-1]
+                node = Node(line[content_start + 1:].rstrip(), depth, position, end, line[:prefix_end], parent)
+                parent.children.append(node)
+                stack.append(node)
+                if parent is self.root and node.tag.startswith("Version-"):
+                    self.versions.append(node)
+            if len(stack) > 1:
+                # Values (dates, names) and blank placeholder lines extend the open nodes.
+                for node in stack[1:]:
+                    node.last = end
+
+    @property
+    def latest(self):
+        return self.versions[-1] if self.versions else None
+
+    @property
+    def latest_version(self):
+        # "@Version-x.y.z", as the regex based lookups returned it.
+        return "@" + self.versions[-1].tag if self.versions else None
+
+    def absolute(self, offset):
+        return self.base + offset
+
+    def line_end(self, node):
+        # Absolute offset just past the last line of node's subtree.
+        return self.base + node.last
+
+    def rebase(self, base):
+        # A copy sharing the parsed tree: the cached entry may be in use on another thread.
+        if base == self.base:
+            return self
+        moved = copy.copy(self)
+        moved.base = base
+        return moved
+
+_cache = {}
+
+def cached(key, base, text):
+    # Re-parses only when the header text itself changed.
+    entry = _cache.get(key)
+    if entry is not None and entry.text == text:
+        entry = entry.rebase(base)
+    else:
+        entry = DocComment(text, base)
+    _cache[key] = entry
+    return entry
+
+def forget(key):
+    _cache.pop(key, None)
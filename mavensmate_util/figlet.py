@@ -0,0 +1,229 @@
+import array
+import functools
+import hashlib
+import marshal
+import os
+import re
+import tempfile
+
+# fonts/ at the package root, next to templates/.
+PACKAGE_FONTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fonts")
+EXTENSION = ".flf"
+DEFAULT_FONT = "ANSI Shadow"
+
+# Version of the compiled cache layout; bump when FigletAtlas.dumps changes.
+CACHE_FORMAT = 1
+
+# Characters every .flf font defines, in file order, before any code-tagged ones.
+REQUIRED_CODES = list(range(32, 127)) + [196, 214, 220, 228, 246, 252, 223]
+
+class FigletAtlas(object):
+    # Glyphs compiled once into one string of rows plus code point and width arrays:
+    # glyph i is widths[i] characters wide and its rows follow each other in data.
+    def __init__(self, height, codes, widths, data):
+        self.height = height
+        self.codes = codes
+        self.glyph_widths = widths
+        self.data = data
+        self.widths = {}
+        self.offsets = {}
+        offset = 0
+        for code, width in zip(codes, widths):
+            letter = chr(code)
+            self.widths[letter] = width
+            self.offsets[letter] = offset
+            offset += width * height
+
+    @staticmethod
+    def from_letters(letters):
+        height = len(letters["A"])
+        codes = array.array("I")
+        widths = array.array("H")
+        data = []
+        for letter in sorted(letters):
+            glyph = letters[letter]
+            width = max([len(row) for row in glyph])
+            codes.append(ord(letter))
+            widths.append(width)
+            data.extend([row.ljust(width) for row in glyph])
+        return FigletAtlas(height, codes, widths, "".join(data))
+
+    def dumps(self):
+        return marshal.dumps((CACHE_FORMAT, self.height, self.codes.tobytes(), self.glyph_widths.tobytes(), self.data))
+
+    @staticmethod
+    def loads(blob):
+        cache_format, height, codes, widths, data = marshal.loads(blob)
+        if cache_format != CACHE_FORMAT:
+            raise ValueError("compiled font format %r" % cache_format)
+        return FigletAtlas(height, array.array("I", codes), array.array("H", widths), data)
+
+    def resolve(self, title):
+        # Fonts without lower case fall back to upper case; other characters the font
+        # has no glyph for are dropped.
+        widths = self.widths
+        letters = []
+        for letter in title:
+            if letter not in widths:
+                letter = letter.upper()
+            if letter in widths:
+                letters.append(letter)
+        return "".join(letters)
+
+    def measure(self, letters):
+        widths = self.widths
+        return sum([widths[letter] for letter in letters])
+
+    def wrap(self, letters, width):
+        chunks = []
+        line = ""
+        for word in re.findall(r" +|[^ ]+", letters):
+            if line and self.measure(line + word) > width:
+                chunks.append(line.rstrip(" "))
+                line = ""
+                if word.startswith(" "):
+                    continue
+            while self.measure(word) > width and len(word) > 1:
+                # A single word wider than the banner is broken between letters.
+                cut = len(word) - 1
+                while cut > 1 and self.measure(word[:cut]) > width:
+                    cut -= 1
+                chunks.append(word[:cut])
+                word = word[cut:]
+            line += word
+        if line.strip(" ") or not chunks:
+            chunks.append(line.rstrip(" "))
+        return chunks
+
+    def render(self, letters):
+        data = self.data
+        widths = self.widths
+        offsets = self.offsets
+        return ["".join([data[offsets[letter] + row * widths[letter]:offsets[letter] + (row + 1) * widths[letter]] for letter in letters]) for row in range(self.height)]
+
+def parse_code(token):
+    # Code tags are decimal, 0x hexadecimal or 0 octal.
+    if token[:2] in ("0x", "0X"):
+        return int(token[2:], 16)
+    if len(token) > 1 and token.startswith("0"):
+        return int(token[1:], 8)
+    return int(token)
+
+def parse(source):
+    # Compiles the text of a FIGlet 2 (.flf) font. Glyphs are kept at full width:
+    # kerning and smushing rules are not applied.
+    lines = source.replace("\r\n", "\n").split("\n")
+    header = lines[0].split()
+    if len(header) < 6 or not header[0].startswith("flf2a") or len(header[0]) < 6:
+        raise ValueError("not a FIGlet font")
+    hardblank = header[0][5]
+    height = int(header[1])
+    position = 1 + int(header[5])
+
+    letters = {}
+    def glyph(position):
+        rows = []
+        for line in lines[position:position + height]:
+            line = line.rstrip()
+            if line:
+                line = line.rstrip(line[-1])
+            rows.append(line.replace(hardblank, " "))
+        return rows if len(rows) == height else None
+
+    for code in REQUIRED_CODES:
+        rows = glyph(position)
+        if rows is None:
+            break
+        letters[chr(code)] = rows
+        position += height
+    while position < len(lines) and lines[position].strip():
+        try:
+            code = parse_code(lines[position].split()[0])
+        except ValueError:
+            break
+        rows = glyph(position + 1)
+        if rows is None:
+            break
+        if 0 < code < 0x110000:
+            letters[chr(code)] = rows
+        position += height + 1
+    if "A" not in letters:
+        raise ValueError("FIGlet font without glyphs")
+    return FigletAtlas.from_letters(letters)
+
+def decode(blob):
+    # .flf files may be zipped (FIGlet 2.2); the font is the first member.
+    if blob[:2] == b"PK":
+        import io
+        import zipfile
+        with zipfile.ZipFile(io.BytesIO(blob)) as archive:
+            blob = archive.read(archive.namelist()[0])
+    return blob.decode("latin-1")
+
+def compile_blob(blob, cache_directory=None):
+    # The compiled table is cached as <sha1 of the .flf>.figfont, so a font is
+    # parsed once and every later load is a single read.
+    if cache_directory is None:
+        return parse(decode(blob))
+    cache_file = os.path.join(cache_directory, hashlib.sha1(blob).hexdigest() + ".figfont")
+    try:
+        with open(cache_file, "rb") as cached:
+            return FigletAtlas.loads(cached.read())
+    except (OSError, ValueError, EOFError, TypeError):
+        pass
+    font = parse(decode(blob))
+    try:
+        if not os.path.isdir(cache_directory):
+            os.makedirs(cache_directory)
+        handle, temporary = tempfile.mkstemp(dir=cache_directory, suffix=".tmp")
+        with os.fdopen(handle, "wb") as target:
+            target.write(font.dumps())
+        os.replace(temporary, cache_file)
+    except OSError:
+        pass
+    return font
+
+_compiled = {}
+
+def compile_file(path, cache_directory=None):
+    # Compiled once per (path, mtime, size); raises OSError if the file is missing.
+    stat = os.stat(path)
+    key = (stat.st_mtime, stat.st_size)
+    cached = _compiled.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with open(path, "rb") as font_file:
+        font = compile_blob(font_file.read(), cache_directory)
+    _compiled[path] = (key, font)
+    return font
+
+def find(name, directories, cache_directory=None):
+    # First directory holding <name>.flf wins.
+    for directory in directories:
+        try:
+            return compile_file(os.path.join(directory, name + EXTENSION), cache_directory)
+        except OSError:
+            continue
+    raise OSError("no %s%s in %s" % (name, EXTENSION, ", ".join(directories)))
+
+_atlas = None
+
+def atlas():
+    # The built-in ANSI Shadow table is only imported and compiled the first time a banner is rendered.
+    global _atlas
+    if _atlas is None:
+        from .ansi_shadow import LETTERS
+        _atlas = FigletAtlas.from_letters(LETTERS)
+    return _atlas
+
+@functools.lru_cache(maxsize=256)
+def render(title, width=None, font=None):
+    # font is a FigletAtlas from find(); None is the built-in ANSI Shadow.
+    font = font or atlas()
+    letters = font.resolve(title)
+    chunks = font.wrap(letters, width) if width else [letters]
+    lines = ["/*"]
+    for chunk in chunks:
+        lines.extend(font.render(chunk))
+    lines.append("*/")
+    return tuple(lines)
@@ -0,0 +1,351 @@
+import bisect
+import itertools
+import re
+import threading
+
+# A line-by-line Apex tokenizer and the outline built from it: classes, inner
+# classes and methods with their annotations and offsets. Comments and strings
+# are blanked before anything is matched, so text in a banner or a literal is
+# never mistaken for a declaration.
+#
+# Apex strings cannot span lines, so the only state carried from one line to
+# the next is "inside a /* */ comment". After an edit only the changed lines
+# are re-tokenized, plus the lines after them whose starting state flipped.
+# The rows each update changed are kept, by revision, so a reader can ask which
+# lines changed since it last looked.
+
+_lexeme = re.compile(r"'(?:\\.|[^'\\])*'?|//|/\*")
+_item = re.compile(r"@(\w+)(?:[ \t]*\([^)]*\))?|\b(class|interface|enum)[ \t]+(\w+)|(\w+)[ \t]*\(|([{};])", re.IGNORECASE)
+
+def blank(line, in_comment):
+    # (code, in_comment after the line, characters inside comments): comments and
+    # string contents as spaces, so columns still line up with the original.
+    parts = []
+    position = 0
+    commented = 0
+    if in_comment:
+        end = line.find("*/")
+        if end < 0:
+            return "", True, len(line)
+        position = end + 2
+        commented = position
+        parts.append(" " * position)
+    while True:
+        match = _lexeme.search(line, position)
+        if match is None:
+            parts.append(line[position:])
+            return "".join(parts), False, commented
+        parts.append(line[position:match.start()])
+        lexeme = match.group()
+        if lexeme == "//":
+            return "".join(parts), False, commented + len(line) - match.start()
+        if lexeme == "/*":
+            end = line.find("*/", match.end())
+            if end < 0:
+                return "".join(parts), True, commented + len(line) - match.start()
+            parts.append(" " * (end + 2 - match.start()))
+            commented += end + 2 - match.start()
+            position = end + 2
+            continue
+        parts.append("'" + " " * (len(lexeme) - 2) + "'" if len(lexeme) > 1 else "'")
+        position = match.end()
+
+def tokenize_line(line, in_comment):
+    # ([(kind, column, value)], in_comment after the line, characters inside comments).
+    # Kinds: "@" annotation, "class" (also interface and enum), "(" a name followed
+    # by a parenthesis, and the punctuation "{", "}" and ";".
+    code, in_comment, commented = blank(line, in_comment)
+    items = []
+    for match in _item.finditer(code):
+        annotation, keyword, name, call, punctuation = match.groups()
+        if annotation is not None:
+            items.append(("@", match.start(), annotation))
+        elif keyword is not None:
+            items.append(("class", match.start(3), name))
+        elif call is not None:
+            items.append(("(", match.start(), call))
+        else:
+            items.append((punctuation, match.start(), punctuation))
+    return items, in_comment, commented
+
+def comment_length(text):
+    # Characters inside comments, lexed as the outline lexes them.
+    total = 0
+    in_comment = False
+    for line in text.split("\n"):
+        code, in_comment, commented = blank(line, in_comment)
+        total += commented
+    return total
+
+def is_test_annotated(annotations):
+    return any(annotation.lower() == "istest" for annotation in annotations)
+
+def declaration(text):
+    # (name, annotations, offset of the name) of the first class, interface or enum,
+    # reading no further; ("", [], -1) without one.
+    in_comment = False
+    annotations = []
+    position = 0
+    while position <= len(text):
+        end = text.find("\n", position)
+        if end < 0:
+            end = len(text)
+        items, in_comment, commented = tokenize_line(text[position:end], in_comment)
+        for kind, column, value in items:
+            if kind == "@":
+                annotations.append(value)
+            elif kind == "class":
+                return value, annotations, position + column
+            elif kind in ("{", "}", ";"):
+                annotations = []
+        position = end + 1
+    return "", [], -1
+
+class Declaration(object):
+    __slots__ = ("kind", "name", "begin", "end", "annotations", "parent", "classes", "methods", "method_begins")
+
+    def __init__(self, kind, name, begin, annotations, parent):
+        self.kind = kind
+        self.name = name
+        # Offset of the name; end is just past the closing brace, None while unclosed.
+        self.begin = begin
+        self.end = None
+        self.annotations = annotations
+        self.parent = parent
+        self.classes = []
+        self.methods = []
+        self.method_begins = []
+
+    @property
+    def is_test(self):
+        return is_test_annotated(self.annotations)
+
+class Outline(object):
+    def __init__(self, text):
+        self.lines = text.split("\n")
+        self.states = []
+        self.items = []
+        self.commented = []
+        state = False
+        for line in self.lines:
+            self.states.append(state)
+            items, state, commented = tokenize_line(line, state)
+            self.items.append(items)
+            self.commented.append(commented)
+        # Characters inside comments, kept up to date by update.
+        self.comment_length = sum(self.commented)
+        self.retokenized = len(self.lines)
+        self.revision = 0
+        # The change_count the text was read at, when cached is given one.
+        self.version = None
+        self.edited = []
+        self.starts = None
+        self._classes = None
+
+    def update(self, text):
+        # Re-tokenizes the lines between the unchanged prefix and suffix, then
+        # carries on only while the comment state at a line start differs from before.
+        lines = text.split("\n")
+        old = self.lines
+        limit = min(len(old), len(lines))
+        top = 0
+        while top < limit and old[top] == lines[top]:
+            top += 1
+        bottom = 0
+        while bottom < limit - top and old[len(old) - 1 - bottom] == lines[len(lines) - 1 - bottom]:
+            bottom += 1
+        old_end = len(old) - bottom
+        new_end = len(lines) - bottom
+        if top == len(old) == len(lines):
+            self.retokenized = 0
+            return 0
+
+        state = self.states[top] if top < len(self.states) else self.end_state(top)
+        states = []
+        items = []
+        commented = []
+        for line in lines[top:new_end]:
+            states.append(state)
+            line_items, state, line_commented = tokenize_line(line, state)
+            items.append(line_items)
+            commented.append(line_commented)
+        suffix_states = self.states[old_end:]
+        suffix_items = self.items[old_end:]
+        suffix_commented = self.commented[old_end:]
+        index = 0
+        while index < len(suffix_states) and suffix_states[index] != state:
+            suffix_states[index] = state
+            suffix_items[index], state, suffix_commented[index] = tokenize_line(lines[new_end + index], state)
+            index += 1
+
+        self.comment_length += sum(commented) + sum(suffix_commented[:index]) - sum(self.commented[top:old_end + index])
+        self.lines = lines
+        self.states = self.states[:top] + states + suffix_states
+        self.items = self.items[:top] + items + suffix_items
+        self.commented = self.commented[:top] + commented + suffix_commented
+        self.revision += 1
+        self.mark(top, old_end, new_end)
+        self.retokenized = len(states) + index
+        self._classes = None
+        return self.retokenized
+
+    def mark(self, top, old_end, new_end):
+        # self.edited holds [first row, end row, revision] spans in current row
+        # numbers. Spans the update touches merge into its own, at its revision;
+        # a deletion marks the line it joined.
+        delta = new_end - old_end
+        begin = top
+        end = max(new_end, top + 1)
+        before = []
+        after = []
+        for first, last, revision in self.edited:
+            if last <= top:
+                before.append([first, last, revision])
+            elif first > old_end:
+                after.append([first + delta, last + delta, revision])
+            else:
+                begin = min(begin, first)
+                end = max(end, last + delta if last > old_end else end)
+        self.edited = before + [[begin, end, self.revision]] + after
+
+    def edited_since(self, revision):
+        # [(first row, end row)] changed by updates after revision.
+        return [(first, last) for first, last, changed in self.edited if changed > revision]
+
+    def end_state(self, row):
+        # Comment state after line row - 1, for an edit that appends lines.
+        if row == 0:
+            return False
+        return tokenize_line(self.lines[row - 1], self.states[row - 1])[1]
+
+    @property
+    def classes(self):
+        # Top-level declarations, built from the token lists on first use after a change.
+        if self._classes is None:
+            self._classes = self.build()
+        return self._classes
+
+    def build(self):
+        starts = [0]
+        starts.extend(itertools.accumulate(len(line) + 1 for line in self.lines))
+        self.starts = starts
+        roots = []
+        stack = []
+        depth = 0
+        annotations = []
+        pending_class = None
+        pending_method = None
+        for row, items in enumerate(self.items):
+            if not items:
+                continue
+            start = starts[row]
+            for kind, column, value in items:
+                if kind == "@":
+                    annotations.append(value)
+                elif kind == "class":
+                    pending_class = Declaration("class", value, start + column, annotations, stack[-1][0] if stack else None)
+                    annotations = []
+                elif kind == "(":
+                    # The first name( directly in a class body is a method or constructor
+                    # if a { follows before any ;.
+                    if stack and depth == stack[-1][1] and stack[-1][0].kind == "class" and pending_method is None and pending_class is None:
+                        pending_method = Declaration("method", value, start + column, annotations, stack[-1][0])
+                        annotations = []
+                elif kind == "{":
+                    depth += 1
+                    if pending_class is not None:
+                        (pending_class.parent.classes if pending_class.parent is not None else roots).append(pending_class)
+                        stack.append((pending_class, depth))
+                        pending_class = None
+                    elif pending_method is not None:
+                        pending_method.parent.methods.append(pending_method)
+                        pending_method.parent.method_begins.append(pending_method.begin)
+                        stack.append((pending_method, depth))
+                        pending_method = None
+                    annotations = []
+                elif kind == "}":
+                    if stack and depth == stack[-1][1]:
+                        stack.pop()[0].end = start + column + 1
+                    depth -= 1
+                    pending_method = None
+                    annotations = []
+                else:
+                    pending_method = None
+                    annotations = []
+        return roots
+
+    @property
+    def outer(self):
+        classes = self.classes
+        return classes[0] if classes else None
+
+    @property
+    def class_name(self):
+        outer = self.outer
+        return outer.name if outer is not None else ""
+
+    @property
+    def is_test(self):
+        outer = self.outer
+        return outer is not None and outer.is_test
+
+    def declarations(self):
+        # Every class and method, depth first in source order.
+        pending = list(reversed(self.classes))
+        while pending:
+            node = pending.pop()
+            yield node
+            if node.kind == "class":
+                pending.extend(reversed(sorted(node.classes + node.methods, key=lambda child: child.begin)))
+
+    def row(self, offset):
+        self.classes
+        return bisect.bisect_right(self.starts, offset) - 1
+
+    def methods_between(self, begin, end):
+        # Methods, in any class, with a line between offsets begin and end; found by
+        # bisecting each class's methods rather than walking them all.
+        found = []
+        pending = list(self.classes)
+        while pending:
+            node = pending.pop()
+            if node.begin >= end or (node.end is not None and node.end < begin):
+                continue
+            pending.extend(node.classes)
+            methods = node.methods
+            index = bisect.bisect_left(node.method_begins, end)
+            while index > 0 and (methods[index - 1].end is None or methods[index - 1].end >= begin):
+                index -= 1
+                found.append(methods[index])
+        return found
+
+    def at(self, offset):
+        # The innermost declaration whose span holds offset, or None.
+        found = None
+        for node in self.declarations():
+            if node.begin <= offset and (node.end is None or offset < node.end):
+                found = node
+        return found
+
+_cache = {}
+_lock = threading.Lock()
+
+def cached(key, text, version=None):
+    # One outline per view, updated in place from the previous version of the text
+    # and built before it is handed out, so readers on another thread see a whole tree.
+    # version is the view's change_count: text older than the cached outline's gets
+    # an outline of its own rather than rewinding the shared one.
+    with _lock:
+        outline = _cache.get(key)
+        if outline is None:
+            outline = _cache[key] = Outline(text)
+        elif version is not None and outline.version is not None and version < outline.version:
+            outline = Outline(text)
+        else:
+            outline.update(text)
+        outline.version = version
+        outline.classes
+        return outline
+
+def forget(key):
+    _cache.pop(key, None)
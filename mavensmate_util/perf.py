@@ -0,0 +1,67 @@
+import collections
+import functools
+import threading
+import time
+
+# Wall time, buffer size and match counts for commands and listener callbacks,
+# kept in a bounded ring buffer. Nothing is printed unless debug is set.
+
+debug = False
+samples = collections.deque(maxlen=2000)
+_current = threading.local()
+
+def record(name, seconds, size=None, matches=None):
+    samples.append((name, seconds, size, matches))
+    if debug:
+        print("MavensMate Util: %s %.2fms size=%s matches=%s" % (name, seconds * 1000, size, matches))
+
+def add_matches(count):
+    # Attributes match counts to the innermost timed call on this thread.
+    sample = getattr(_current, "sample", None)
+    if sample is not None:
+        sample["matches"] = (sample["matches"] or 0) + count
+
+def timed(name, size=None):
+    # size(args) returns the buffer size the call worked on, if any.
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            outer = getattr(_current, "sample", None)
+            sample = { "matches": None }
+            _current.sample = sample
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                _current.sample = outer
+                try:
+                    buffer_size = size(args) if size is not None else None
+                except Exception:
+                    buffer_size = None
+                record(name, elapsed, buffer_size, sample["matches"])
+        return wrapper
+    return decorate
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[int(round(fraction * (len(ordered) - 1)))]
+
+def report():
+    # [(name, count, p50, p95, max)] in seconds, slowest first.
+    by_name = collections.defaultdict(list)
+    for name, seconds, size, matches in list(samples):
+        by_name[name].append(seconds)
+    rows = [(name, len(values), percentile(values, 0.5), percentile(values, 0.95), max(values)) for name, values in by_name.items()]
+    return sorted(rows, key=lambda row: row[4], reverse=True)
+
+def format_report():
+    lines = ["%-60s %7s %10s %10s %10s" % ("Command", "Calls", "p50 ms", "p95 ms", "max ms")]
+    for name, count, p50, p95, longest in report():
+        lines.append("%-60s %7d %10.2f %10.2f %10.2f" % (name, count, p50 * 1000, p95 * 1000, longest * 1000))
+    return "\n".join(lines)
+
+def seconds_per_char(name):
+    # Median cost per character of recorded calls to name, or None without samples.
+    rates = [seconds / size for sample_name, seconds, size, matches in list(samples) if sample_name == name and size]
+    return percentile(rates, 0.5) if rates else None
@@ -0,0 +1,168 @@
+import json
+import os
+import tempfile
+import threading
+
+from . import apex, outline
+
+# Maps Apex class names to their files, header version, @IsTest status and
+# test pairing, and totals the characters that count toward the org's Apex
+# limit. Persisted as JSON and refreshed by mtime and size, so only files that
+# changed since the last run are read.
+
+EXTENSIONS = (".cls",)
+FORMAT = 2
+
+def scan_file(path):
+    with open(path, encoding="utf-8", errors="replace") as source:
+        text = source.read()
+    header = apex.find_header(text)
+    header_text = text[header[0]:header[1]] if header else ""
+    is_test = apex.is_test(text)
+    return {
+        "class_name": apex.find_class_name(text) or os.path.splitext(os.path.basename(path))[0],
+        "version": apex.latest_version(header_text),
+        "is_test": is_test,
+        "unit_tests": apex.find_unit_tests(header_text),
+        "length": len(text),
+        "counted": counted_length(text, is_test)
+    }
+
+def counted_length(text, is_test):
+    # Characters toward the Apex limit: comments and test classes are not counted.
+    return 0 if is_test else len(text) - outline.comment_length(text)
+
+def test_names(class_name):
+    return [class_name + "_Test", class_name + "Test"]
+
+def class_names_under_test(test_name):
+    lower = test_name.lower()
+    for suffix in ("_test", "test"):
+        if lower.endswith(suffix) and len(lower) > len(suffix):
+            return [test_name[:-len(suffix)]]
+    return []
+
+class ProjectIndex(object):
+    def __init__(self, roots):
+        self.roots = sorted(roots)
+        self.files = {}
+        self.classes = {}
+        self.tested_by = {}
+        self.testing = {}
+        self.counted = 0
+        self.lock = threading.Lock()
+
+    def load(self, path):
+        try:
+            with open(path, encoding="utf-8") as source:
+                data = json.load(source)
+        except (OSError, ValueError):
+            return False
+        if data.get("format") != FORMAT or data.get("roots") != self.roots:
+            return False
+        with self.lock:
+            self.files = data["files"]
+            self.rebuild()
+        return True
+
+    def save(self, path):
+        with self.lock:
+            data = { "format": FORMAT, "roots": self.roots, "files": dict(self.files) }
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, "w", encoding="utf-8") as target:
+            json.dump(data, target)
+        os.replace(temporary, path)
+
+    def walk(self):
+        for root in self.roots:
+            for directory, directories, files in os.walk(root):
+                directories[:] = [name for name in directories if not name.startswith(".")]
+                for name in files:
+                    if name.endswith(EXTENSIONS):
+                        yield os.path.join(directory, name)
+
+    def update(self):
+        # Returns the number of files that were (re)read.
+        files = {}
+        read = 0
+        for path in self.walk():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = self.files.get(path)
+            if entry is None or entry["mtime"] != stat.st_mtime or entry["size"] != stat.st_size:
+                try:
+                    entry = scan_file(path)
+                except OSError:
+                    continue
+                entry["mtime"] = stat.st_mtime
+                entry["size"] = stat.st_size
+                read += 1
+            files[path] = entry
+        with self.lock:
+            changed = read or len(files) != len(self.files)
+            self.files = files
+            self.rebuild()
+        return read if changed else 0
+
+    def update_file(self, path):
+        if not path.endswith(EXTENSIONS) or not any(path.startswith(root) for root in self.roots):
+            return
+        try:
+            stat = os.stat(path)
+            entry = scan_file(path)
+        except OSError:
+            return
+        entry["mtime"] = stat.st_mtime
+        entry["size"] = stat.st_size
+        with self.lock:
+            files = dict(self.files)
+            files[path] = entry
+            self.files = files
+            self.rebuild()
+
+    def rebuild(self):
+        classes = {}
+        tested_by = {}
+        testing = {}
+        counted = 0
+        for path, entry in self.files.items():
+            classes[entry["class_name"].lower()] = path
+            counted += entry["counted"]
+            for test in entry["unit_tests"]:
+                tested_by.setdefault(entry["class_name"].lower(), []).append(test)
+                testing.setdefault(test.lower(), []).append(path)
+        self.classes = classes
+        self.tested_by = tested_by
+        self.testing = testing
+        self.counted = counted
+
+    def lookup(self, class_name):
+        # (path, entry) or None; Apex class names are case-insensitive.
+        path = self.classes.get(class_name.lower())
+        return (path, self.files[path]) if path is not None else None
+
+    def tests_for(self, class_name):
+        # Tests declared under @UnitTests first, then the <Class>_Test naming convention.
+        found = []
+        for name in self.tested_by.get(class_name.lower(), []) + test_names(class_name):
+            match = self.lookup(name)
+            if match is not None and match not in found:
+                found.append(match)
+        return found
+
+    def classes_under_test(self, test_name):
+        found = []
+        for name in class_names_under_test(test_name):
+            match = self.lookup(name)
+            if match is not None:
+                found.append(match)
+        for path in self.testing.get(test_name.lower(), []):
+            match = (path, self.files[path])
+            if match not in found:
+                found.append(match)
+        return found
@@ -0,0 +1,75 @@
+import hashlib
+import re
+
+from . import apex, titles, views
+
+# Test classes for whole projects: the test_method scaffold AddTestMethodCommand
+# inserts, rendered once for every public method that has no test yet.
+
+FIRST_VERSION = "@Version-1.0.0"
+CACHE_FORMAT = 1
+
+_public_method = re.compile(r"^[ \t]*(?:global|public)[ \t]+(?:(?:static|virtual|override|abstract|webservice)[ \t]+)*[\w.<>, \[\]]+?[ \t]+(\w+)[ \t]*\(", re.MULTILINE | re.IGNORECASE)
+_test_method = re.compile(r"\bvoid[ \t]+test_?(\w+)[ \t]*\(", re.IGNORECASE)
+
+def source_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def public_methods(text):
+    # Public and global method names in source order, one entry per overload set.
+    names = []
+    for name in _public_method.findall(apex.strip_comments(text)):
+        if name not in names:
+            names.append(name)
+    return names
+
+def test_name(method_name):
+    return method_name[:1].upper() + method_name[1:]
+
+def tested_methods(test_text):
+    # Lower-cased names of the methods covered by test<Name>() in a test class.
+    return set(name.lower() for name in _test_method.findall(test_text))
+
+def test_method(method_template, values, method_name, indent="\t", tab_size=4):
+    # The same text AddTestMethodCommand inserts on an indented line, fields resolved.
+    offset = len(titles.replace_tabs_with_spaces(indent, tab_size))
+    text = method_template.render(dict(values,
+        method_name=test_name(method_name),
+        start_test_title=titles.get_title("Start Test", offset),
+        stop_test_title=titles.get_title("Stop Test", offset)
+    ))
+    return indent + views.BatchEdit.expand_snippet(text).replace("\n", "\n" + indent)
+
+def test_class(header_template, class_template, method_template, class_name, methods, author="", tab_size=4, newline="\n"):
+    test_class_name = class_name + "_Test"
+    values = {
+        "class_name": test_class_name,
+        "version": FIRST_VERSION,
+        "date": views.today(),
+        "author": author,
+        "is_test": True
+    }
+    header = header_template.render(dict(values, border="=" * (len(test_class_name) + 6)))
+    body = "\n\n".join(test_method(method_template, dict(values, class_name=class_name), name, "\t", tab_size) for name in methods)
+    return (header + "\n" + class_template.render(dict(values, methods=body)) + "\n").replace("\n", newline)
+
+def append_tests(test_text, method_template, class_name, methods, author="", tab_size=4):
+    # Adds test methods for the uncovered methods before the class's closing brace.
+    # Returns the new text and the method names that were added.
+    tested = tested_methods(test_text)
+    missing = [name for name in methods if test_name(name).lower() not in tested]
+    close = test_text.rfind("}")
+    if not missing or close < 0:
+        return test_text, []
+
+    header = apex.find_header(test_text)
+    values = {
+        "class_name": class_name,
+        "version": (apex.latest_version(test_text[header[0]:header[1]]) if header else None) or FIRST_VERSION,
+        "date": views.today(),
+        "author": author,
+        "is_test": True
+    }
+    newline = "\r\n" if "\r\n" in test_text else "\n"
+    body = "\n\n".join(test_method(method_template, values, name, "\t", tab_size) for name in missing).replace("\n", newline)
+    return test_text[:close].rstrip() + newline + newline + body + newline + test_text[close:], missing
@@ -0,0 +1,108 @@
+import re
+import time
+
+from . import apex, views
+
+# Rewrites made on save, chosen per file extension. A rule's pattern has one group,
+# the value its action replaces; every rule for a file is compiled into a single
+# alternation so the buffer is walked once however many rules apply.
+#
+#   scope:  "all" (default) or "header", the file's first doc comment
+#   select: "all" (default) or "last", the last match in scope
+
+RULES = {
+    "console_version": { "pattern": r"console\.log\('Version: (\d+)'\);", "action": "increment" },
+    "markup_version": { "pattern": r"<!--[ \t]*Version: (\d+)[ \t]*-->", "action": "increment" },
+    "header_date": { "pattern": r"@Date[ \t]*\r?\n[ \t]*\*[ \t]*(\d{4}-\d{2}-\d{2})", "action": "today", "scope": "header", "select": "last" },
+    "header_version": { "pattern": r"@Version-(\d+(?:\.\d+)*)", "action": "bump", "scope": "header", "select": "last" }
+}
+
+FILE_RULES = {
+    ".js": ["console_version"],
+    ".page": ["console_version"],
+    ".cmp": ["markup_version"],
+    ".cls": ["header_date"],
+    ".trigger": ["header_date"]
+}
+
+ACTIONS = {
+    "increment": lambda value: str(int(value) + 1),
+    "bump": apex.bump_version,
+    "today": lambda value: views.today()
+}
+
+def rules_for(path, file_rules=None, definitions=None):
+    # [(name, rule)] for a file name; settings may add extensions and rules.
+    if not path:
+        return []
+    file_rules = dict(FILE_RULES, **(file_rules or {}))
+    definitions = dict(RULES, **(definitions or {}))
+    names = []
+    for extension, rule_names in file_rules.items():
+        if path.endswith(extension):
+            names.extend([name for name in rule_names if name not in names])
+    return [(name, definitions[name]) for name in names if name in definitions]
+
+class Scanner(object):
+    # Rules scoped to the header are compiled apart from the rest and only run over
+    # the header, so they add nothing per character of a large file.
+    def __init__(self, rules):
+        self.rules = rules
+        parts = { "all": [], "header": [] }
+        for index, (name, rule) in enumerate(rules):
+            if rule.get("action") not in ACTIONS:
+                raise ValueError("stamp rule %s: unknown action %r" % (name, rule.get("action")))
+            if re.compile(rule["pattern"]).groups < 1:
+                raise ValueError("stamp rule %s: pattern needs a group around the value" % name)
+            parts["header" if rule.get("scope") == "header" else "all"].append("(?P<r%d>%s)" % (index, rule["pattern"]))
+        # (scope, pattern); no pattern for a scope without rules, as an empty
+        # alternation would match everywhere.
+        self.passes = [(scope, re.compile("|".join(parts[scope]), re.MULTILINE)) for scope in ("all", "header") if parts[scope]]
+
+    def scan(self, text, limit=None):
+        # [(rule index, begin, end, value)] in buffer order, one pass over text[:limit]
+        # and one over the header.
+        end = len(text) if limit is None else min(len(text), limit)
+        rules = self.rules
+        matches = []
+        last = {}
+        for scope, pattern in self.passes:
+            span = (0, end) if scope == "all" else apex.find_header(text, end)
+            if span is None:
+                continue
+            for match in pattern.finditer(text, span[0], span[1]):
+                index = int(match.lastgroup[1:])
+                # The value is the first group inside each rule's own group.
+                group = pattern.groupindex[match.lastgroup] + 1
+                found = (index, match.start(group), match.end(group), match.group(group))
+                if rules[index][1].get("select") == "last":
+                    last[index] = found
+                else:
+                    matches.append(found)
+        return sorted(matches + list(last.values()), key=lambda found: found[1])
+
+    def edits(self, matches):
+        # [begin, end, text] per match, values computed now (so dates are the save's).
+        rules = self.rules
+        return [[begin, end, ACTIONS[rules[index][1]["action"]](value)] for index, begin, end, value in matches]
+
+    def profile(self, text):
+        # [(name, seconds, matches)] with each rule's pattern run on its own; for
+        # finding the expensive rule, not for use on save.
+        timings = []
+        for name, rule in self.rules:
+            pattern = re.compile(rule["pattern"], re.MULTILINE)
+            start = time.perf_counter()
+            count = sum(1 for match in pattern.finditer(text))
+            timings.append((name, time.perf_counter() - start, count))
+        return timings
+
+_scanners = {}
+
+def scanner(rules):
+    # Compiled once per distinct rule list.
+    key = repr(rules)
+    compiled = _scanners.get(key)
+    if compiled is None:
+        compiled = _scanners[key] = Scanner(rules)
+    return compiled
@@ -0,0 +1,91 @@
+import os
+import re
+
+# templates/ at the package root, next to comment_utilities.py.
+PACKAGE_TEMPLATES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+EXTENSION = ".template"
+
+class Template(object):
+    # A scaffold compiled once into literal parts and {{slots}}.
+    # {{#flag}}...{{/flag}} keeps a block when flag is truthy, {{^flag}}...{{/flag}} when it is not.
+    token = re.compile(r"\{\{([#^/]?)(\w+)\}\}")
+
+    def __init__(self, source):
+        self.parts = Template.compile(source)
+
+    @staticmethod
+    def compile(source):
+        root = []
+        stack = [(None, root)]
+        position = 0
+        for match in Template.token.finditer(source):
+            parts = stack[-1][1]
+            if match.start() > position:
+                parts.append(source[position:match.start()])
+            position = match.end()
+            kind, name = match.groups()
+            if kind in ("#", "^"):
+                block = []
+                parts.append((kind, name, block))
+                stack.append((name, block))
+            elif kind == "/":
+                if stack[-1][0] != name:
+                    raise ValueError("unbalanced {{/%s}} in template" % name)
+                stack.pop()
+            else:
+                parts.append((None, name, None))
+        if len(stack) > 1:
+            raise ValueError("unclosed {{%s}} in template" % stack[-1][0])
+        if position < len(source):
+            root.append(source[position:])
+        return root
+
+    @staticmethod
+    def render_parts(parts, values, out):
+        for part in parts:
+            if part.__class__ is str:
+                out.append(part)
+                continue
+            kind, name, block = part
+            value = values.get(name)
+            if kind is None:
+                if value is not None:
+                    out.append(str(value))
+            elif bool(value) == (kind == "#"):
+                Template.render_parts(block, values, out)
+        return out
+
+    def render(self, values, newline="\n"):
+        text = "".join(Template.render_parts(self.parts, values, []))
+        if newline != "\n":
+            text = text.replace("\n", newline)
+        return text
+
+def load(source):
+    # Editors add a final newline; it is not part of the template.
+    source = source.replace("\r\n", "\n")
+    if source.endswith("\n"):
+        source = source[:-1]
+    return Template(source)
+
+_compiled = {}
+
+def compile_file(path):
+    # Compiled once per (path, mtime); raises OSError if the file is missing.
+    mtime = os.stat(path).st_mtime
+    cached = _compiled.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, encoding="utf-8") as template_file:
+        template = load(template_file.read())
+    _compiled[path] = (mtime, template)
+    return template
+
+def find(name, directories):
+    # First directory holding <name>.template wins.
+    for directory in directories:
+        try:
+            return compile_file(os.path.join(directory, name + EXTENSION))
+        except OSError:
+            continue
+    raise OSError("no %s%s in %s" % (name, EXTENSION, ", ".join(directories)))
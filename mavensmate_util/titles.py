@@ -0,0 +1,49 @@
+import re
+
+# See https://github.com/mborgerson/Pad/blob/master/pad.py
+
+# Column width that section titles and wrapped banners are sized to.
+TITLE_WIDTH = 110
+
+def get_title(title, offset, width=TITLE_WIDTH):
+    fill_width = width - offset
+    if title:
+        fill_width = (fill_width - len(title) - 7) // 2
+    else:
+        title = ""
+    fill_char = "-"
+    return "// " + (fill_char * fill_width) + "  " + title + "  " + (fill_char * fill_width)
+
+# A line get_title produced, at any indent: "<indent>// ----  Title  ----".
+RULER_PATTERN = r"^[ \t]*// -+  .*  -+[ \t]*$"
+_ruler = re.compile(r"([ \t]*)(// -+  (.*?)  -+)[ \t]*$")
+
+def ruler_change(line, tab_size, width=TITLE_WIDTH):
+    # (begin, end, ruler) within the line when its fill no longer fits its indent, else None.
+    match = _ruler.match(line)
+    if match is None:
+        return None
+    ruler = get_title(match.group(3), len(replace_tabs_with_spaces(match.group(1), tab_size)), width)
+    if ruler == match.group(2):
+        return None
+    return (match.start(2), match.end(2), ruler)
+
+def replace_tabs_with_spaces(text, tab_size):
+    if text:
+        return text.replace("\t", " " * tab_size)
+    else:
+        return ""
+
+def title_change(view, region, tab_size):
+    line = view.line(region)
+    if region.empty():
+        # No text selected, pad entire line title.
+        title = view.substr(line)
+        offset = 0
+        replace_region = line
+    else:
+        # Pad inside selected region.
+        title = view.substr(region)
+        offset = len(replace_tabs_with_spaces(view.substr(line)[:-len(title)], tab_size))
+        replace_region = region
+    return (replace_region, get_title(title, offset))
@@ -0,0 +1,190 @@
+import datetime
+import re
+
+from . import apex, changed, doc_comment, outline
+
+# Helpers that only talk to a view through its API (find, substr, line, sel,
+# replace, run_command), so they work against any object that provides it.
+
+def today():
+    return "%s" %  datetime.date.today().strftime("%Y-%m-%d")
+
+# sublime.Region, or a stand-in outside the editor; set by whoever imports this module.
+Region = None
+
+class ApexHeaderIndex(object):
+    # Facts about a view's Apex header, scanned once per change_count. Buffers over
+    # large_file_threshold characters are only searched in their first
+    # large_file_scan_window characters.
+    _views = {}
+
+    def __init__(self, view):
+        settings = view.settings()
+        size = view.size()
+        self.change_count = view.change_count()
+        self.bounded = size > settings.get("large_file_threshold", 2097152)
+        limit = min(size, settings.get("large_file_scan_window", 262144)) if self.bounded else size
+        text = view.substr(Region(0, limit))
+
+        header = apex.find_header(text)
+        self.header_region = Region(header[0], header[1]) if header else Region(-1, -1)
+        self.doc_comment = doc_comment.cached(view.id(), header[0] if header else -1, text[header[0]:header[1]] if header else "")
+        self.version = self.doc_comment.latest_version
+        if self.bounded:
+            # Only the declaration is needed; the window is not worth an outline.
+            self.outline = None
+            self.class_name, annotations, begin = outline.declaration(text)
+            self.is_test = outline.is_test_annotated(annotations)
+        else:
+            self.outline = outline.cached(view.id(), text, self.change_count)
+            self.class_name = self.outline.class_name
+            self.is_test = self.outline.is_test
+
+    @staticmethod
+    def get(view):
+        index = ApexHeaderIndex._views.get(view.id())
+        if index is None or index.change_count != view.change_count():
+            index = ApexHeaderIndex(view)
+            ApexHeaderIndex._views[view.id()] = index
+        return index
+
+    @staticmethod
+    def refresh(view, change_count):
+        # Background prewarm. Skipped when the buffer already moved past change_count,
+        # and the result dropped when it moved while scanning.
+        index = ApexHeaderIndex._views.get(view.id())
+        if view.change_count() != change_count or (index is not None and index.change_count == change_count):
+            return
+        index = ApexHeaderIndex(view)
+        if index.change_count == change_count == view.change_count():
+            ApexHeaderIndex._views[view.id()] = index
+
+    @staticmethod
+    def invalidate(view):
+        ApexHeaderIndex._views.pop(view.id(), None)
+
+    @staticmethod
+    def close(view):
+        ApexHeaderIndex.invalidate(view)
+        doc_comment.forget(view.id())
+        outline.forget(view.id())
+        changed.forget(view.id())
+
+class ViewFacts(object):
+    # Per-view values read at most once while a batch is computed.
+    def __init__(self, view):
+        self.view = view
+        self._index = None
+        self._today = None
+        self._settings = view.settings()
+        self.tab_size = self._settings.get("tab_size")
+
+    @property
+    def loaded(self):
+        return self._index is not None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = ApexHeaderIndex.get(self.view)
+        return self._index
+
+    @property
+    def class_name(self):
+        return self.index.class_name
+
+    @property
+    def header_region(self):
+        return self.index.header_region
+
+    @property
+    def is_test(self):
+        return self.index.is_test
+
+    @property
+    def doc_comment(self):
+        return self.index.doc_comment
+
+    @property
+    def outline(self):
+        # None for buffers over large_file_threshold.
+        return self.index.outline
+
+    @property
+    def version(self):
+        if self.index.version is None:
+            raise IndexError("no @Version in header")
+        return self.index.version
+
+    @property
+    def author(self):
+        return self._settings.get('tm_fullname')
+
+    @property
+    def today(self):
+        if self._today is None:
+            self._today = today()
+        return self._today
+
+    def values(self, **extra):
+        # Template slots shared by every scaffold.
+        values = {
+            "class_name": self.class_name,
+            "version": self.index.version,
+            "date": self.today,
+            "author": self.author,
+            "is_test": self.is_test
+        }
+        values.update(extra)
+        return values
+
+class BatchEdit(object):
+    # Renders every selection first, then applies the results back to front in one edit.
+    # render(region, facts) returns None, (region, text) or (region, text, is_snippet).
+    def __init__(self, view):
+        self.view = view
+        self.facts = ViewFacts(view)
+
+    @staticmethod
+    def expand_snippet(contents):
+        # Resolve snippet fields to their defaults so the text can go through view.replace.
+        defaults = dict(re.findall(r"\$\{(\d+):([^}]*)\}", contents))
+        def transform(match):
+            flags = match.group(4)
+            return re.sub(match.group(2), lambda m: match.group(3), defaults.get(match.group(1), ""), 0 if "g" in flags else 1)
+        contents = re.sub(r"\$\{(\d+)/([^/]*)/([^/]*)/(\w*)\}", transform, contents)
+        contents = re.sub(r"\$\{(\d+):([^}]*)\}", lambda m: m.group(2), contents)
+        contents = re.sub(r"\$(\d+)", lambda m: defaults.get(m.group(1), ""), contents)
+        return contents.replace("\\$", "$")
+
+    def run(self, edit, render):
+        # Returns the ViewFacts the batch was rendered against.
+        view = self.view
+        selections = list(view.sel())
+        changes = []
+        seen = set()
+        for region in selections:
+            change = render(region, self.facts)
+            if change is None:
+                continue
+            key = (change[0].begin(), change[0].end())
+            if key in seen:
+                continue
+            seen.add(key)
+            changes.append((change[0], change[1], len(change) > 2 and change[2]))
+
+        if not changes:
+            return self.facts
+        snippets = set([text for region, text, is_snippet in changes if is_snippet])
+        if len(snippets) == 1 and len(changes) == len(selections) and all(is_snippet and region == selection for (region, text, is_snippet), selection in zip(changes, selections)):
+            # Same snippet at every cursor: one native multi-cursor insertion keeps the tab stops.
+            view.run_command("insert_snippet", { "contents": snippets.pop() })
+            return self.facts
+
+        for region, text, is_snippet in sorted(changes, key=lambda change: change[0].begin(), reverse=True):
+            if is_snippet:
+                # Match insert_snippet, which indents following lines to the cursor's line.
+                indent = re.match(r"[ \t]*", view.substr(view.line(region.begin()))).group(0)
+                text = BatchEdit.expand_snippet(text).replace("\n", "\n" + indent)
+            view.replace(edit, region, text)
+        return self.facts